@@ -10,25 +10,185 @@ A股自选股智能分析系统 - AI分析层
 3. 结合技术面和消息面生成分析报告
 """
 
+import asyncio
+import bisect
+import contextlib
+import functools
+import hashlib
 import json
 import logging
+import math
+import operator
+import random
+import re
+import sqlite3
+import threading
 import time
-from dataclasses import dataclass
-from typing import Optional, Dict, Any, List
+import weakref
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+from types import MappingProxyType
+from dataclasses import dataclass, field, fields
+from typing import Optional, Dict, Any, List, Iterator, Callable
 
+import numpy as np
 from tenacity import (
-    retry,
+    Retrying,
     stop_after_attempt,
-    wait_exponential,
     retry_if_exception_type,
-    before_sleep_log,
 )
 
 from config import get_config
 
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，未安装时回退到标准库 json
+    orjson = None
+
+try:
+    import jiter
+except ImportError:  # jiter 为可选依赖（随 openai 安装），用于流式响应的部分解析
+    jiter = None
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
+def _json_loads(text: str) -> Any:
+    """
+    解析 JSON 文本
+    
+    优先使用 orjson（C 实现，比标准库快数倍）；orjson 不接受的写法
+    （如 NaN）回退到标准库，保证兼容性
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
+
+def _json_default(obj: Any) -> Any:
+    """JSON 编码器不认识的类型：numpy 标量/数组转为 Python 原生值"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _has_non_finite(obj: Any) -> bool:
+    """是否包含 NaN / ±inf（orjson 会把它们静默写成 null，标准库则输出 NaN/Infinity）"""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, np.ndarray):
+            if value.dtype.kind == 'f' and not np.isfinite(value).all():
+                return True
+            if value.dtype == object:
+                stack.extend(value.ravel().tolist())
+    return False
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """
+    序列化为 UTF-8 编码的 JSON 字节串
+    
+    优先使用 orjson；numpy 标量经 _json_default 转换。含 NaN/inf 时走标准库，
+    与未安装 orjson 时的输出保持一致
+    """
+    if orjson is not None and not _has_non_finite(obj):
+        return orjson.dumps(obj, default=_json_default)
+    return json.dumps(obj, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+
+@functools.cache
+def _genai():
+    """延迟导入 google.generativeai（首次调用时导入，之后直接返回缓存的模块）"""
+    import google.generativeai as genai
+    return genai
+
+
+@functools.cache
+def _system_instruction(prompt: str):
+    """
+    系统提示词的 Content proto（构建一次后复用）
+    
+    SDK 直接接受 proto 而不再做 str -> Content 转换，切换备选模型或重建上下文缓存时无需重复构建
+    """
+    genai = _genai()
+    return genai.protos.Content(parts=[genai.protos.Part(text=prompt)])
+
+
+@functools.cache
+def _openai_cls():
+    """延迟导入 OpenAI 客户端类"""
+    from openai import OpenAI
+    return OpenAI
+
+
+@functools.cache
+def _httpx():
+    """延迟导入 httpx（openai 的依赖）"""
+    import httpx
+    return httpx
+
+
+@functools.cache
+def _rate_limit_error_types() -> tuple:
+    """
+    SDK 的限流异常类型（首次出错时导入，此时对应 SDK 已加载）
+    
+    Returns:
+        (限流异常类型元组, SDK 其他 API 异常类型元组)
+    """
+    rate_limit, api_errors = [], []
+    try:
+        import openai
+        rate_limit.append(openai.RateLimitError)
+        api_errors.append(openai.APIError)
+    except ImportError:
+        pass
+    try:
+        from google.api_core import exceptions as google_exceptions
+        # REST 传输的 429 抛 TooManyRequests；gRPC 的 ResourceExhausted 是其子类
+        rate_limit.append(google_exceptions.TooManyRequests)
+        api_errors.append(google_exceptions.GoogleAPICallError)
+    except ImportError:
+        pass
+    return tuple(rate_limit), tuple(api_errors)
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    """
+    判断是否为 429 限流错误
+    
+    SDK 抛出的类型化异常按类型判断；其他异常（如代理/网关包装的错误）
+    回退到错误信息关键字匹配
+    """
+    rate_limit, api_errors = _rate_limit_error_types()
+    if isinstance(error, rate_limit):
+        return True
+    if isinstance(error, api_errors):
+        return False
+    error_str = str(error).lower()
+    return '429' in error_str or 'quota' in error_str or 'rate' in error_str
+
+
 # 股票名称映射（常见股票）
 STOCK_NAME_MAP = {
     # 常见股票
@@ -57,8 +217,143 @@ STOCK_NAME_MAP = {
     '601198': '东兴证券',
 }
 
+# 只读视图，模块内统一通过它查询（STOCK_NAME_MAP 保留供外部导入）
+_NAME_MAP = MappingProxyType(STOCK_NAME_MAP)
+
+# 操作建议 -> emoji
+_EMOJI_MAP = MappingProxyType({
+    '买入': '🟢',
+    '加仓': '🟢',
+    '强烈买入': '💚',
+    '持有': '🟡',
+    '观望': '⚪',
+    '减仓': '🟠',
+    '卖出': '🔴',
+    '强烈卖出': '❌',
+})
+
+# 置信度 -> 星级
+_STAR_MAP = MappingProxyType({'高': '⭐⭐⭐', '中': '⭐⭐', '低': '⭐'})
+
+# markdown 代码块中的 JSON 对象
+_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
 
-@dataclass
+# JSON 扫描：字符串字面量（含转义）整体跳过，只关注花括号
+_RE_JSON_SCAN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}]', re.DOTALL)
+
+
+def _extract_json_span(text: str) -> tuple:
+    """
+    定位文本中第一个完整的顶层 JSON 对象
+    
+    从第一个 '{' 开始单次扫描，按深度匹配花括号，字符串内的花括号不计入；
+    JSON 后面的说明文字中即使带花括号也不会被截入。
+    对象未闭合（如响应被截断）时退回到最后一个 '}'，与旧逻辑一致
+    
+    Returns:
+        (start, end)，未找到时 start 为 -1
+    """
+    start = text.find('{')
+    if start < 0:
+        return -1, 0
+    depth = 0
+    for match in _RE_JSON_SCAN.finditer(text, start):
+        token = match.group()
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+            if depth == 0:
+                return start, match.end()
+    return start, text.rfind('}') + 1
+
+
+class _JsonSpanTracker:
+    """
+    流式响应的增量花括号匹配器
+    
+    逐个分片喂入，跨分片保持字符串/转义/深度状态；第一个顶层 JSON 对象
+    闭合时 feed() 返回 True，调用方即可停止接收（JSON 之后的内容不再需要）。
+    members 为已接收完整的顶层键值对个数（按顶层逗号计数），调用方据此
+    只在有新字段完成时才做部分解析
+    """
+    
+    __slots__ = ('depth', 'started', 'in_string', 'escape', 'complete', 'members')
+    
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+        self.complete = False
+        self.members = 0
+    
+    def feed(self, chunk: str) -> bool:
+        """喂入一个分片，返回顶层对象是否已闭合"""
+        if self.complete:
+            return True
+        depth, started, in_string, escape = self.depth, self.started, self.in_string, self.escape
+        members = self.members
+        for ch in chunk:
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == '\\':
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '{':
+                depth += 1
+                started = True
+            elif not started:
+                continue
+            elif ch == '"':
+                in_string = True
+            elif ch == '}':
+                depth -= 1
+                if depth == 0:
+                    self.complete = True
+                    break
+            elif ch == ',' and depth == 1:
+                members += 1
+        self.depth, self.started, self.in_string, self.escape = depth, started, in_string, escape
+        self.members = members
+        return self.complete
+
+
+# 纯文本响应的情绪关键词
+_POSITIVE_KEYWORDS = frozenset(['看多', '买入', '上涨', '突破', '强势', '利好', '加仓', 'bullish', 'buy'])
+_NEGATIVE_KEYWORDS = frozenset(['看空', '卖出', '下跌', '跌破', '弱势', '利空', '减仓', 'bearish', 'sell'])
+# 零宽前瞻使匹配可以重叠，单次扫描即可找出所有出现过的关键词（关键词互不为前缀）
+_RE_SENTIMENT_KEYWORDS = re.compile(
+    '(?=(' + '|'.join(map(re.escape, sorted(_POSITIVE_KEYWORDS | _NEGATIVE_KEYWORDS))) + '))'
+)
+
+# _fix_json_string 使用的修复规则（合并为一个正则，单次扫描）：
+# - 字符串字面量原样保留（避免误伤其中的 URL "http://..."、逗号和 True/False）
+# - 尾随逗号（其后到 } / ] 之间允许有空白和注释）
+# - 行注释 // ... 与块注释 /* ... */
+# - Python 风格的 True / False（仅完整单词）
+_RE_FIXUP = re.compile(
+    r'"(?:[^"\\]|\\.)*"'
+    r'|,(?:\s|//[^\n]*|/\*.*?\*/)*(?=[}\]])'
+    r'|//[^\n]*'
+    r'|/\*.*?\*/'
+    r'|\bTrue\b|\bFalse\b',
+    re.DOTALL,
+)
+_FIXUP = MappingProxyType({'True': 'true', 'False': 'false'})
+
+
+def _fixup_replacement(match: 're.Match') -> str:
+    """字符串原样保留，布尔值转小写，其余匹配（注释、尾随逗号）替换为空"""
+    token = match.group()
+    if token[0] == '"':
+        return token
+    return _FIXUP.get(token, '')
+
+
+@dataclass(slots=True)
 class AnalysisResult:
     """
     AI 分析结果数据类 - 决策仪表盘版
@@ -111,48 +406,57 @@ class AnalysisResult:
     success: bool = True
     error_message: Optional[str] = None
     
+    # dashboard 分区解析缓存（内部使用，不参与比较/输出）
+    _sections: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+    
     def to_dict(self) -> Dict[str, Any]:
-        """转换为字典"""
-        return {
-            'code': self.code,
-            'name': self.name,
-            'sentiment_score': self.sentiment_score,
-            'trend_prediction': self.trend_prediction,
-            'operation_advice': self.operation_advice,
-            'confidence_level': self.confidence_level,
-            'dashboard': self.dashboard,  # 决策仪表盘数据
-            'trend_analysis': self.trend_analysis,
-            'short_term_outlook': self.short_term_outlook,
-            'medium_term_outlook': self.medium_term_outlook,
-            'technical_analysis': self.technical_analysis,
-            'ma_analysis': self.ma_analysis,
-            'volume_analysis': self.volume_analysis,
-            'pattern_analysis': self.pattern_analysis,
-            'fundamental_analysis': self.fundamental_analysis,
-            'sector_position': self.sector_position,
-            'company_highlights': self.company_highlights,
-            'news_summary': self.news_summary,
-            'market_sentiment': self.market_sentiment,
-            'hot_topics': self.hot_topics,
-            'analysis_summary': self.analysis_summary,
-            'key_points': self.key_points,
-            'risk_warning': self.risk_warning,
-            'buy_reason': self.buy_reason,
-            'search_performed': self.search_performed,
-            'success': self.success,
-            'error_message': self.error_message,
-        }
+        """转换为字典（不含 raw_response / data_sources）"""
+        return dict(zip(_FIELDS, _GETTER(self)))
+    
+    @classmethod
+    def dump_many(cls, results: List['AnalysisResult']) -> List[Dict[str, Any]]:
+        """批量转换为字典列表（报告导出用）"""
+        return [dict(zip(_FIELDS, _GETTER(r))) for r in results]
+    
+    def to_json_bytes(self) -> bytes:
+        """转换为 JSON 字节串（UTF-8，用于报告导出/缓存）"""
+        return _json_dumps(self.to_dict())
+
+    @classmethod
+    def dumps_many(cls, results: List['AnalysisResult']) -> bytes:
+        """
+        批量序列化为一个 JSON 数组字节串（一次编码，避免逐条 dumps 后拼接）
+        
+        dashboard 中的 numpy 数值与 NaN 与 to_json_bytes() 的处理一致，单条结果不会导致整批失败
+        """
+        return _json_dumps(cls.dump_many(results))
+
+    def _dashboard_sections(self) -> tuple:
+        """
+        解析一次 dashboard 的常用分区：(dashboard, core_conclusion, battle_plan, intelligence)
+        
+        按 dashboard 对象缓存；dashboard 被整体替换后自动重新解析
+        """
+        cached = self._sections
+        dashboard = self.dashboard
+        if cached is None or cached[0] is not dashboard:
+            d = dashboard or {}
+            cached = (dashboard, d.get('core_conclusion'), d.get('battle_plan'), d.get('intelligence'))
+            self._sections = cached
+        return cached
     
     def get_core_conclusion(self) -> str:
         """获取核心结论（一句话）"""
-        if self.dashboard and 'core_conclusion' in self.dashboard:
-            return self.dashboard['core_conclusion'].get('one_sentence', self.analysis_summary)
+        core = self._dashboard_sections()[1]
+        if core is not None:
+            return core.get('one_sentence', self.analysis_summary)
         return self.analysis_summary
     
     def get_position_advice(self, has_position: bool = False) -> str:
         """获取持仓建议"""
-        if self.dashboard and 'core_conclusion' in self.dashboard:
-            pos_advice = self.dashboard['core_conclusion'].get('position_advice', {})
+        core = self._dashboard_sections()[1]
+        if core is not None:
+            pos_advice = core.get('position_advice', {})
             if has_position:
                 return pos_advice.get('has_position', self.operation_advice)
             return pos_advice.get('no_position', self.operation_advice)
@@ -160,40 +464,595 @@ class AnalysisResult:
     
     def get_sniper_points(self) -> Dict[str, str]:
         """获取狙击点位"""
-        if self.dashboard and 'battle_plan' in self.dashboard:
-            return self.dashboard['battle_plan'].get('sniper_points', {})
+        battle_plan = self._dashboard_sections()[2]
+        if battle_plan is not None:
+            return battle_plan.get('sniper_points', {})
         return {}
     
     def get_checklist(self) -> List[str]:
         """获取检查清单"""
-        if self.dashboard and 'battle_plan' in self.dashboard:
-            return self.dashboard['battle_plan'].get('action_checklist', [])
+        battle_plan = self._dashboard_sections()[2]
+        if battle_plan is not None:
+            return battle_plan.get('action_checklist', [])
         return []
     
     def get_risk_alerts(self) -> List[str]:
         """获取风险警报"""
-        if self.dashboard and 'intelligence' in self.dashboard:
-            return self.dashboard['intelligence'].get('risk_alerts', [])
+        intelligence = self._dashboard_sections()[3]
+        if intelligence is not None:
+            return intelligence.get('risk_alerts', [])
         return []
     
+    @property
+    def sniper_points(self) -> Dict[str, str]:
+        """狙击点位（同 get_sniper_points）"""
+        return self.get_sniper_points()
+    
+    @property
+    def checklist(self) -> List[str]:
+        """检查清单（同 get_checklist）"""
+        return self.get_checklist()
+    
+    @property
+    def risk_alerts(self) -> List[str]:
+        """风险警报（同 get_risk_alerts）"""
+        return self.get_risk_alerts()
+    
     def get_emoji(self) -> str:
         """根据操作建议返回对应 emoji"""
-        emoji_map = {
-            '买入': '🟢',
-            '加仓': '🟢',
-            '强烈买入': '💚',
-            '持有': '🟡',
-            '观望': '⚪',
-            '减仓': '🟠',
-            '卖出': '🔴',
-            '强烈卖出': '❌',
-        }
-        return emoji_map.get(self.operation_advice, '🟡')
+        return _EMOJI_MAP.get(self.operation_advice, '🟡')
     
     def get_confidence_stars(self) -> str:
         """返回置信度星级"""
-        star_map = {'高': '⭐⭐⭐', '中': '⭐⭐', '低': '⭐'}
-        return star_map.get(self.confidence_level, '⭐⭐')
+        return _STAR_MAP.get(self.confidence_level, '⭐⭐')
+
+
+# to_dict 输出的字段（按声明顺序），类创建后计算一次
+_FIELDS = tuple(
+    f.name for f in fields(AnalysisResult)
+    if f.name not in ('raw_response', 'data_sources') and not f.name.startswith('_')
+)
+_GETTER = operator.attrgetter(*_FIELDS)
+
+
+# 成交量/成交额量级：< 1万 按原值，>= 1万 除以 1万，>= 1亿 除以 1亿
+_UNIT_THRESHOLDS = (1e4, 1e8)
+_UNIT_SCALES = (1.0, 1e4, 1e8)
+_UNIT_SPECS = ('.0f', '.2f', '.2f')
+_VOLUME_SUFFIXES = ('股', '万股', '亿股')
+_AMOUNT_SUFFIXES = ('元', '万元', '亿元')
+
+
+def _format_scaled(value: Optional[float], suffixes: tuple) -> str:
+    """按量级查表格式化数值（如 1.23 亿股）"""
+    if value is None:
+        return 'N/A'
+    # NaN 与任何阈值比较都为 False，按最小量级处理
+    i = bisect.bisect_right(_UNIT_THRESHOLDS, value) if value == value else 0
+    return f"{format(value / _UNIT_SCALES[i], _UNIT_SPECS[i])} {suffixes[i]}"
+
+
+def _format_scaled_vec(values, suffixes: tuple) -> List[str]:
+    """_format_scaled 的批量版本：用 np.digitize 一次性确定整列的量级"""
+    arr = np.asarray(values, dtype=float)
+    idx = np.digitize(arr, _UNIT_THRESHOLDS)
+    idx[np.isnan(arr)] = 0
+    scaled = arr / np.take(_UNIT_SCALES, idx)
+    return [f"{format(v, _UNIT_SPECS[i])} {suffixes[i]}" for v, i in zip(scaled.tolist(), idx.tolist())]
+
+
+# ========== Prompt 模板（模块加载时构建一次，_format_prompt 中按段填充后一次性拼接）==========
+
+_PROMPT_HEADER_TMPL = """# 决策仪表盘分析请求
+
+## 📊 股票基础信息
+| 项目 | 数据 |
+|------|------|
+| 股票代码 | **{code}** |
+| 股票名称 | **{stock_name}** |
+| 分析日期 | {date} |
+
+---
+
+## 📈 技术面数据
+
+### 今日行情
+| 指标 | 数值 |
+|------|------|
+| 收盘价 | {close} 元 |
+| 开盘价 | {open} 元 |
+| 最高价 | {high} 元 |
+| 最低价 | {low} 元 |
+| 涨跌幅 | {pct_chg}% |
+| 成交量 | {volume} |
+| 成交额 | {amount} |
+
+### 均线系统（关键判断指标）
+| 均线 | 数值 | 说明 |
+|------|------|------|
+| MA5 | {ma5} | 短期趋势线 |
+| MA10 | {ma10} | 中短期趋势线 |
+| MA20 | {ma20} | 中期趋势线 |
+| 均线形态 | {ma_status} | 多头/空头/缠绕 |
+"""
+
+_PROMPT_REALTIME_TMPL = """
+### 实时行情增强数据
+| 指标 | 数值 | 解读 |
+|------|------|------|
+| 当前价格 | {price} 元 | |
+| **量比** | **{volume_ratio}** | {volume_ratio_desc} |
+| **换手率** | **{turnover_rate}%** | |
+| 市盈率(动态) | {pe_ratio} | |
+| 市净率 | {pb_ratio} | |
+| 总市值 | {total_mv} | |
+| 流通市值 | {circ_mv} | |
+| 60日涨跌幅 | {change_60d}% | 中期表现 |
+"""
+
+_PROMPT_CHIP_TMPL = """
+### 筹码分布数据（效率指标）
+| 指标 | 数值 | 健康标准 |
+|------|------|----------|
+| **获利比例** | **{profit_ratio:.1%}** | 70-90%时警惕 |
+| 平均成本 | {avg_cost} 元 | 现价应高于5-15% |
+| 90%筹码集中度 | {concentration_90:.2%} | <15%为集中 |
+| 70%筹码集中度 | {concentration_70:.2%} | |
+| 筹码状态 | {chip_status} | |
+"""
+
+_PROMPT_DIVIDEND_TMPL = """
+### 💰 Dang氏预期股息分析
+| 指标 | 数值 | 判定标准 |
+|------|------|----------|
+| **预期股息率** | **{expected_yield:.2f}%** | >5%为优质生产资料 |
+| 计算逻辑 | {reason} | |
+"""
+
+_PROMPT_VALUATION_TMPL = """
+### 📊 绝对估值安全度 (纵向历史)
+| 指标 | 当前值 | 10年分位 | 判定 |
+|------|--------|----------|------|
+| **PE(TTM)** | **{current_pe:.2f}** | **{pe_rank_10y:.1f}%** | {verdict} |
+"""
+
+_PROMPT_PEER_TMPL = """
+### 👥 同业比价 (横向对比)
+| 行业 | 行业中位PE | 行业龙头 |
+|------|------------|----------|
+| {industry} | {avg_pe:.2f} | {top_peers} |
+
+*注：请将当前PE与行业中位PE对比，计算折价率。*
+"""
+
+_PROMPT_TREND_TMPL = """
+### 趋势分析预判（基于交易理念）
+| 指标 | 数值 | 判定 |
+|------|------|------|
+| 趋势状态 | {trend_status} | |
+| 均线排列 | {ma_alignment} | MA5>MA10>MA20为多头 |
+| 趋势强度 | {trend_strength}/100 | |
+| **乖离率(MA5)** | **{bias_ma5:+.2f}%** | {bias_warning} |
+| 乖离率(MA10) | {bias_ma10:+.2f}% | |
+| 量能状态 | {volume_status} | {volume_trend} |
+| 系统信号 | {buy_signal} | |
+| 系统评分 | {signal_score}/100 | |
+
+#### 系统分析理由
+**买入理由**：
+{signal_reasons}
+
+**风险因素**：
+{risk_factors}
+"""
+
+_PROMPT_BUY_POINT_TMPL = """
+### 📊 技术买点分析（MA120加分机制）
+| 指标 | 数值 | 说明 |
+|------|------|------|
+| **综合评级** | **{label} {label_text}** | ⭐最佳/🟢良好/🟡观望/🔴规避 |
+| 短期信号 | {short_signal} | {short_signal_detail} |
+| MA120状态 | {ma120_status} | 偏离度 {ma120_deviation:+.1f}% |
+| 半年线MA120 | {ma120}元 | 价值区分界线 |
+| 当前价格 | {current_price}元 | |
+| 量比 | {volume_ratio} | |
+
+**📌 系统建议**：{current_advice}
+
+**关键价位**：
+- 加仓位：{add_price}元
+- 止盈位：{take_profit_price}元  
+- 止损位：{stop_loss_price}元
+
+*请综合MA120位置（低于MA120加分）和短期信号（缩量回踩/放量突破）给出最终建议。*
+"""
+
+_PROMPT_YESTERDAY_TMPL = """
+### 量价变化
+- 成交量较昨日变化：{volume_change}倍
+- 价格较昨日变化：{price_change}%
+"""
+
+_PROMPT_NEWS_HEADER = """
+---
+
+## 📰 舆情情报
+"""
+
+_PROMPT_NEWS_TMPL = """
+以下是 **{stock_name}({code})** 近7日的新闻搜索结果，请重点提取：
+1. 🚨 **风险警报**：减持、处罚、利空
+2. 🎯 **利好催化**：业绩、合同、政策
+3. 📊 **业绩预期**：年报预告、业绩快报
+
+```
+{news_context}
+```
+"""
+
+_PROMPT_NO_NEWS = """
+未搜索到该股票近期的相关新闻。请主要依据技术面数据进行分析。
+"""
+
+_PROMPT_TASK_TMPL = """
+---
+
+## ✅ 分析任务
+
+请为 **{stock_name}({code})** 生成【决策仪表盘】，严格按照 JSON 格式输出。
+
+### 重点关注（必须明确回答）：
+1. ❓ 是否满足 MA5>MA10>MA20 多头排列？
+2. ❓ 当前乖离率是否在安全范围内（<5%）？—— 超过5%必须标注"严禁追高"
+3. ❓ 量能是否配合（缩量回调/放量突破）？
+4. ❓ 筹码结构是否健康？
+5. ❓ 消息面有无重大利空？（减持、处罚、业绩变脸等）
+
+### 决策仪表盘要求：
+- **核心结论**：一句话说清该买/该卖/该等
+- **持仓分类建议**：空仓者怎么做 vs 持仓者怎么做
+- **具体狙击点位**：买入价、止损价、目标价（精确到分）
+- **检查清单**：每项用 ✅/⚠️/❌ 标记
+
+请输出完整的 JSON 格式决策仪表盘。"""
+
+
+# ========== Prompt 段落渲染 ==========
+# 各段落渲染为纯函数并按输入内容缓存：同一只股票短时间内重复分析时，
+# 未变化的段落（实时行情、筹码等）直接复用渲染结果
+
+def _freeze(value: Any) -> Any:
+    """将 dict/list 递归转换为可哈希的 tuple"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _section_items(data: Dict[str, Any]) -> tuple:
+    """
+    段落数据的缓存键：((key, 值类型, 冻结后的值), ...)
+    
+    带上值类型，避免 1 / 1.0 / True 这类相等但渲染结果不同的值命中同一条缓存
+    """
+    return tuple(sorted((k, type(v), _freeze(v)) for k, v in data.items()))
+
+
+def _section_dict(items: tuple) -> Dict[str, Any]:
+    """由缓存键还原段落数据"""
+    return {k: v for k, _, v in items}
+
+
+def _render_section(renderer, data: Dict[str, Any]) -> str:
+    """按段落数据调用带缓存的渲染函数；含不可哈希/不可排序的值时直接渲染"""
+    try:
+        key = _section_items(data)
+        hash(key)
+    except TypeError:
+        return renderer.__wrapped__(tuple((k, type(v), v) for k, v in data.items()))
+    return renderer(key)
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_realtime(items: tuple) -> str:
+    """实时行情增强数据段落"""
+    rt = _section_dict(items)
+    return _PROMPT_REALTIME_TMPL.format(
+        price=rt.get('price', 'N/A'),
+        volume_ratio=rt.get('volume_ratio', 'N/A'),
+        volume_ratio_desc=rt.get('volume_ratio_desc', ''),
+        turnover_rate=rt.get('turnover_rate', 'N/A'),
+        pe_ratio=rt.get('pe_ratio', 'N/A'),
+        pb_ratio=rt.get('pb_ratio', 'N/A'),
+        total_mv=_format_scaled(rt.get('total_mv'), _AMOUNT_SUFFIXES),
+        circ_mv=_format_scaled(rt.get('circ_mv'), _AMOUNT_SUFFIXES),
+        change_60d=rt.get('change_60d', 'N/A'),
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_chip(items: tuple) -> str:
+    """筹码分布段落"""
+    chip = _section_dict(items)
+    return _PROMPT_CHIP_TMPL.format(
+        profit_ratio=chip.get('profit_ratio', 0),
+        avg_cost=chip.get('avg_cost', 'N/A'),
+        concentration_90=chip.get('concentration_90', 0),
+        concentration_70=chip.get('concentration_70', 0),
+        chip_status=chip.get('chip_status', '未知'),
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_dividend(items: tuple) -> str:
+    """Dang氏预期股息段落"""
+    div = _section_dict(items)
+    return _PROMPT_DIVIDEND_TMPL.format(
+        expected_yield=div.get('expected_yield', 0),
+        reason=div.get('reason', 'N/A'),
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_valuation(items: tuple) -> str:
+    """历史估值分位段落"""
+    val_hist = _section_dict(items)
+    pe_rank = val_hist.get('pe_rank_10y', 0)
+    return _PROMPT_VALUATION_TMPL.format(
+        current_pe=val_hist.get('current_pe', 0),
+        pe_rank_10y=pe_rank,
+        verdict="✅ 底部区域" if pe_rank < 20 else "⚠️ 偏高",
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_peer(items: tuple) -> str:
+    """同业比价段落"""
+    peers = _section_dict(items)
+    return _PROMPT_PEER_TMPL.format(
+        industry=peers.get('industry', '未知'),
+        avg_pe=peers.get('avg_pe', 0),
+        top_peers=', '.join(peers.get('top_peers', [])[:3]),
+    )
+
+
+def _bullet(items) -> str:
+    """渲染 Markdown 列表（每项前缀 "- "），空列表渲染为 "- 无"。"""
+    return "- " + "\n- ".join(items) if items else "- 无"
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_trend(items: tuple) -> str:
+    """趋势分析预判段落"""
+    trend = _section_dict(items)
+    bias_warning = "🚨 超过5%，严禁追高！" if trend.get('bias_ma5', 0) > 5 else "✅ 安全范围"
+    return _PROMPT_TREND_TMPL.format(
+        trend_status=trend.get('trend_status', '未知'),
+        ma_alignment=trend.get('ma_alignment', '未知'),
+        trend_strength=trend.get('trend_strength', 0),
+        bias_ma5=trend.get('bias_ma5', 0),
+        bias_warning=bias_warning,
+        bias_ma10=trend.get('bias_ma10', 0),
+        volume_status=trend.get('volume_status', '未知'),
+        volume_trend=trend.get('volume_trend', ''),
+        buy_signal=trend.get('buy_signal', '未知'),
+        signal_score=trend.get('signal_score', 0),
+        signal_reasons=_bullet(trend.get('signal_reasons')),
+        risk_factors=_bullet(trend.get('risk_factors')),
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_buy_point(items: tuple) -> str:
+    """技术买点分析段落"""
+    bp = _section_dict(items)
+    return _PROMPT_BUY_POINT_TMPL.format(
+        label=bp.get('label', ''),
+        label_text=bp.get('label_text', ''),
+        short_signal=bp.get('short_signal', '无'),
+        short_signal_detail=bp.get('short_signal_detail', ''),
+        ma120_status=bp.get('ma120_status', 'N/A'),
+        ma120_deviation=bp.get('ma120_deviation', 0),
+        ma120=bp.get('ma120', 'N/A'),
+        current_price=bp.get('current_price', 'N/A'),
+        volume_ratio=bp.get('volume_ratio', 'N/A'),
+        current_advice=bp.get('current_advice', '无'),
+        add_price=bp.get('add_price', 'N/A'),
+        take_profit_price=bp.get('take_profit_price', 'N/A'),
+        stop_loss_price=bp.get('stop_loss_price', 'N/A'),
+    )
+
+
+class _AsyncTokenBucket:
+    """
+    异步令牌桶限速器（AIMD 自适应）
+    
+    平均每秒放行 rate 个请求，最多积攒 capacity 个令牌（允许的突发量）；
+    遇到限流时速率减半（乘性减），连续 RECOVER_AFTER 次成功后按
+    初始速率的 1/10 逐步恢复（加性增），上限为初始速率
+    """
+    
+    RECOVER_AFTER = 10  # 连续成功多少次后提高一档速率
+    
+    def __init__(self, rate: float, capacity: int = 1):
+        self._max_rate = rate
+        self._min_rate = rate / 16
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._seen_rate_limits = 0
+        self._successes = 0
+    
+    @property
+    def rate(self) -> float:
+        """当前放行速率（次/秒）"""
+        return self._rate
+    
+    def feedback(self, rate_limit_hits: int) -> None:
+        """
+        根据累计限流次数调整速率
+        
+        Args:
+            rate_limit_hits: 分析器累计遇到的限流次数；
+                             比上次看到的多则视为新的限流，否则视为一次成功
+        """
+        if rate_limit_hits > self._seen_rate_limits:
+            self._seen_rate_limits = rate_limit_hits
+            self._successes = 0
+            self._rate = max(self._min_rate, self._rate / 2)
+            logger.info(f"[限速] 检测到 API 限流，请求速率降至 {self._rate:.3f} 次/秒")
+            return
+        
+        self._successes += 1
+        if self._successes >= self.RECOVER_AFTER and self._rate < self._max_rate:
+            self._successes = 0
+            self._rate = min(self._max_rate, self._rate + self._max_rate / 10)
+            logger.debug(f"[限速] 请求速率恢复至 {self._rate:.3f} 次/秒")
+    
+    async def acquire(self) -> None:
+        """获取一个令牌，不足时异步等待（不阻塞事件循环）"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class AnalysisCache:
+    """
+    LLM 响应缓存（内存 LRU + SQLite 持久化两级）
+    
+    以 sha256(系统提示词版本 + 模型 + Prompt) 为键缓存原始响应文本：
+    Prompt 完全相同（如盘中重复运行、行情未变化）时直接复用，不再调用 API。
+    条目按 TTL 过期，保证新闻/行情更新后会重新分析。
+    """
+    
+    def __init__(self, path: Optional[str] = None, ttl: int = 14400, max_memory_items: int = 256):
+        """
+        Args:
+            path: SQLite 缓存文件路径（None 或空字符串表示仅使用内存）
+            ttl: 缓存有效期（秒），<= 0 表示禁用缓存
+            max_memory_items: 内存层最多保留的条目数
+        """
+        self._ttl = ttl
+        self._max_memory_items = max_memory_items
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (过期时间, 响应文本)
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        self._path = None
+        
+        if self.enabled and path:
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                with self._connect(path) as conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS llm_cache "
+                        "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                    )
+                    conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+                self._path = path
+            except sqlite3.Error as e:
+                logger.warning(f"[缓存] 持久化缓存初始化失败，仅使用内存缓存: {e}")
+    
+    @property
+    def enabled(self) -> bool:
+        return self._ttl > 0
+    
+    @staticmethod
+    @contextlib.contextmanager
+    def _connect(path: str) -> Iterator[sqlite3.Connection]:
+        # 每次操作新建连接：分析在多个线程中并发执行，sqlite3 连接不能跨线程共享
+        # sqlite3 连接自身的 with 只提交/回滚事务而不关闭，用完需显式 close
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def make_key(prompt: str, model_name: Optional[str], prompt_version: str) -> str:
+        """生成缓存键"""
+        digest = hashlib.sha256()
+        for part in (prompt_version, model_name or '', prompt):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取未过期的缓存响应，未命中返回 None"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return entry[1]
+                del self._memory[key]
+        
+        if self._path:
+            try:
+                with self._connect(self._path) as conn:
+                    row = conn.execute(
+                        "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                logger.debug(f"[缓存] 读取持久化缓存失败: {e}")
+                row = None
+            if row is not None:
+                value, expires_at = row
+                with self._lock:
+                    self._remember(key, expires_at, value)
+                    self._stats['disk_hits'] += 1
+                return value
+        
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+    
+    def set(self, key: str, value: str) -> None:
+        """写入缓存"""
+        if not self.enabled:
+            return
+        expires_at = time.time() + self._ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+        if self._path:
+            try:
+                with self._connect(self._path) as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, value, expires_at),
+                    )
+            except sqlite3.Error as e:
+                logger.debug(f"[缓存] 写入持久化缓存失败: {e}")
+    
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        """写入内存层（调用方持有锁）"""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_memory_items:
+            self._memory.popitem(last=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        """命中率统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_items'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
 
 
 class GeminiAnalyzer:
@@ -356,6 +1215,18 @@ class GeminiAnalyzer:
 3. **零废话**：Text 字段内容必须干练冷峻，不要出现"根据分析..."等废话。
 """
 
+    # OpenAI 系统消息：所有请求复用同一个对象，保证前缀逐字节一致以命中服务端自动 Prompt 缓存
+    SYSTEM_MESSAGE = MappingProxyType({"role": "system", "content": SYSTEM_PROMPT})
+    
+    # 系统提示词版本（参与缓存键计算，提示词修改后旧缓存自动失效）
+    PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:16]
+    
+    # 默认生成配置
+    GENERATION_CONFIG = {
+        "temperature": 0.7,
+        "max_output_tokens": 8192,
+    }
+
     def __init__(self, api_key: Optional[str] = None):
         """
         初始化 AI 分析器
@@ -365,32 +1236,57 @@ class GeminiAnalyzer:
         Args:
             api_key: Gemini API Key（可选，默认从配置读取）
         """
-        config = get_config()
+        self._config = get_config()
+        config = self._config
         self._api_key = api_key or config.gemini_api_key
         self._model = None
         self._current_model_name = None  # 当前使用的模型名称
         self._using_fallback = False  # 是否正在使用备选模型
         self._use_openai = False  # 是否使用 OpenAI 兼容 API
+        # 当前调用策略（切换到 OpenAI 时一并重新绑定，调用路径上无需再判断 _use_openai）
+        self._invoke = self._invoke_gemini
+        self._invoke_stream = self._stream_gemini
         self._openai_client = None  # OpenAI 客户端
+        self._http_client = None  # OpenAI 客户端共享的 httpx 连接池
+        self._prompt_cache = None  # Gemini 系统提示词上下文缓存
+        # 保护 _model / _prompt_cache / _current_model_name 的读取与替换（多个分析线程共享同一实例）
+        self._model_lock = threading.RLock()
+        self._backoff_schedule = self._build_backoff_schedule()
+        self._rate_limit_hits = 0  # 累计遇到的 API 限流次数（供批量限速器自适应调整）
+        self._rate_limit_lock = threading.Lock()
+        self.cache = AnalysisCache(config.analysis_cache_path, config.analysis_cache_ttl)
         
-        # 检查 Gemini API Key 是否有效（过滤占位符）
-        gemini_key_valid = self._api_key and not self._api_key.startswith('your_') and len(self._api_key) > 10
-        
-        # 优先尝试初始化 Gemini
-        if gemini_key_valid:
-            try:
-                self._init_model()
-            except Exception as e:
-                logger.warning(f"Gemini 初始化失败: {e}，尝试 OpenAI 兼容 API")
+        # SDK（google.generativeai / openai）较重，推迟到首次 is_available()/分析时再导入并初始化
+        self._clients_ready = False
+        self._init_lock = threading.Lock()
+    
+    def _ensure_clients(self) -> None:
+        """首次使用时初始化 Gemini / OpenAI 客户端（线程安全，仅执行一次）"""
+        if self._clients_ready:
+            return
+        with self._init_lock:
+            if self._clients_ready:
+                return
+            
+            # 检查 Gemini API Key 是否有效（过滤占位符）
+            gemini_key_valid = self._api_key and not self._api_key.startswith('your_') and len(self._api_key) > 10
+            
+            # 优先尝试初始化 Gemini
+            if gemini_key_valid:
+                try:
+                    self._init_model()
+                except Exception as e:
+                    logger.warning(f"Gemini 初始化失败: {e}，尝试 OpenAI 兼容 API")
+                    self._init_openai_fallback()
+            else:
+                # Gemini Key 未配置，尝试 OpenAI
+                logger.info("Gemini API Key 未配置，尝试使用 OpenAI 兼容 API")
                 self._init_openai_fallback()
-        else:
-            # Gemini Key 未配置，尝试 OpenAI
-            logger.info("Gemini API Key 未配置，尝试使用 OpenAI 兼容 API")
-            self._init_openai_fallback()
-        
-        # 两者都未配置
-        if not self._model and not self._openai_client:
-            logger.warning("未配置任何 AI API Key，AI 分析功能将不可用")
+            
+            # 两者都未配置
+            if not self._model and not self._openai_client:
+                logger.warning("未配置任何 AI API Key，AI 分析功能将不可用")
+            self._clients_ready = True
     
     def _init_openai_fallback(self) -> None:
         """
@@ -402,7 +1298,7 @@ class GeminiAnalyzer:
         - 通义千问
         - Moonshot 等
         """
-        config = get_config()
+        config = self._config
         
         # 检查 OpenAI API Key 是否有效（过滤占位符）
         openai_key_valid = (
@@ -417,7 +1313,8 @@ class GeminiAnalyzer:
         
         # 分离 import 和客户端创建，以便提供更准确的错误信息
         try:
-            from openai import OpenAI
+            httpx = _httpx()
+            OpenAI = _openai_cls()
         except ImportError:
             logger.error("未安装 openai 库，请运行: pip install openai")
             return
@@ -428,9 +1325,23 @@ class GeminiAnalyzer:
             if config.openai_base_url and config.openai_base_url.startswith('http'):
                 client_kwargs["base_url"] = config.openai_base_url
             
+            # 共享连接池：并发分析复用 TCP/TLS 连接，装有 h2 时启用 HTTP/2 多路复用
+            # 空闲连接保活 300 秒（httpx 默认仅 5 秒，短于两次分析之间的请求间隔）
+            # 不传自定义 transport，以保留环境变量中的代理配置（trust_env）
+            self._http_client = httpx.Client(
+                http2=_HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(120.0, connect=5.0),
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=300),
+            )
+            weakref.finalize(self, self._http_client.close)
+            client_kwargs["http_client"] = self._http_client
+            
             self._openai_client = OpenAI(**client_kwargs)
             self._current_model_name = config.openai_model
             self._use_openai = True
+            self._release_prompt_cache()
+            self._invoke = self._call_openai_api
+            self._invoke_stream = self._stream_openai
             logger.info(f"OpenAI 兼容 API 初始化成功 (base_url: {config.openai_base_url}, model: {config.openai_model})")
         except ImportError as e:
             # 依赖缺失（如 socksio）
@@ -454,13 +1365,13 @@ class GeminiAnalyzer:
         - 不启用 Google Search（使用外部 Tavily/SerpAPI 搜索）
         """
         try:
-            import google.generativeai as genai
+            genai = _genai()
             
             # 配置 API Key
             genai.configure(api_key=self._api_key)
             
             # 从配置获取模型名称
-            config = get_config()
+            config = self._config
             model_name = config.gemini_model
             fallback_model = config.gemini_model_fallback
             
@@ -469,20 +1380,14 @@ class GeminiAnalyzer:
             
             # 尝试初始化主模型
             try:
-                self._model = genai.GenerativeModel(
-                    model_name=model_name,
-                    system_instruction=self.SYSTEM_PROMPT,
-                )
+                self._model = self._create_model(model_name)
                 self._current_model_name = model_name
                 self._using_fallback = False
                 logger.info(f"Gemini 模型初始化成功 (模型: {model_name})")
             except Exception as model_error:
                 # 尝试备选模型
                 logger.warning(f"主模型 {model_name} 初始化失败: {model_error}，尝试备选模型 {fallback_model}")
-                self._model = genai.GenerativeModel(
-                    model_name=fallback_model,
-                    system_instruction=self.SYSTEM_PROMPT,
-                )
+                self._model = self._create_model(fallback_model)
                 self._current_model_name = fallback_model
                 self._using_fallback = True
                 logger.info(f"Gemini 备选模型初始化成功 (模型: {fallback_model})")
@@ -491,38 +1396,228 @@ class GeminiAnalyzer:
             logger.error(f"Gemini 模型初始化失败: {e}")
             self._model = None
     
-    def _switch_to_fallback_model(self) -> bool:
+    def _create_model(self, model_name: str):
         """
-        切换到备选模型
+        创建 Gemini 模型实例
         
-        Returns:
-            是否成功切换
+        优先使用上下文缓存（CachedContent）承载系统提示词，避免每次请求
+        重复发送和计费 SYSTEM_PROMPT；模型不支持缓存、提示词低于最小缓存
+        长度或缓存创建失败时，回退为普通的 system_instruction 模型
+        
+        Args:
+            model_name: 模型名称
         """
-        try:
-            import google.generativeai as genai
-            config = get_config()
-            fallback_model = config.gemini_model_fallback
+        genai = _genai()
+        system_instruction = _system_instruction(self.SYSTEM_PROMPT)
+        
+        with self._model_lock:
+            # 替换前删除旧缓存：服务端缓存在 TTL 内持续计费，丢弃引用不会释放
+            self._release_prompt_cache()
             
-            logger.warning(f"[LLM] 切换到备选模型: {fallback_model}")
-            self._model = genai.GenerativeModel(
-                model_name=fallback_model,
-                system_instruction=self.SYSTEM_PROMPT,
+            ttl = self._config.gemini_context_cache_ttl
+            if ttl > 0:
+                try:
+                    self._prompt_cache = genai.caching.CachedContent.create(
+                        model=model_name,
+                        system_instruction=system_instruction,
+                        ttl=timedelta(seconds=ttl),
+                    )
+                    logger.info(f"[Gemini] 系统提示词上下文缓存已创建 (模型: {model_name}, TTL: {ttl}s)")
+                    return genai.GenerativeModel.from_cached_content(self._prompt_cache)
+                except Exception as e:
+                    logger.info(f"[Gemini] 上下文缓存不可用，使用普通调用: {e}")
+                    self._release_prompt_cache()
+            
+            return genai.GenerativeModel(
+                model_name=model_name,
+                system_instruction=system_instruction,
             )
-            self._current_model_name = fallback_model
-            self._using_fallback = True
-            logger.info(f"[LLM] 备选模型 {fallback_model} 初始化成功")
-            return True
+    
+    def _model_snapshot(self) -> tuple:
+        """在同一把锁下读取 (模型, 上下文缓存名, 模型名)，保证一次请求使用的三者一致"""
+        with self._model_lock:
+            return self._model, getattr(self._prompt_cache, 'name', None), self._current_model_name
+    
+    def _release_prompt_cache(self) -> None:
+        """删除当前的服务端上下文缓存（已过期或已被删除时忽略错误）"""
+        with self._model_lock:
+            cache, self._prompt_cache = self._prompt_cache, None
+        if cache is None:
+            return
+        try:
+            cache.delete()
         except Exception as e:
-            logger.error(f"[LLM] 切换备选模型失败: {e}")
+            logger.debug(f"[Gemini] 删除上下文缓存失败（可能已过期）: {e}")
+    
+    def _refresh_prompt_cache(self, error: Exception, cache_name: Optional[str]) -> bool:
+        """
+        上下文缓存过期或失效时重新创建模型
+        
+        缓存到期时并发的请求会同时失败：只有失败所用的缓存仍是当前缓存时才重建，
+        其他线程已重建过的直接用新模型重试，避免互相删除对方刚创建的缓存
+        
+        Args:
+            error: 本次调用的异常
+            cache_name: 本次调用所用上下文缓存的 name（未使用缓存时为 None）
+            
+        Returns:
+            是否可以用新模型立即重试（仅在使用缓存且错误为 NotFound/PermissionDenied 时）
+        """
+        if cache_name is None:
+            return False
+        try:
+            from google.api_core import exceptions as google_exceptions
+        except ImportError:
             return False
+        if not isinstance(error, (google_exceptions.NotFound, google_exceptions.PermissionDenied)):
+            return False
+        with self._model_lock:
+            if getattr(self._prompt_cache, 'name', None) != cache_name:
+                # 其他线程已重建缓存或已切换模型
+                return True
+            logger.info("[Gemini] 上下文缓存已失效，重新创建")
+            try:
+                self._model = self._create_model(self._current_model_name)
+                return True
+            except Exception as e:
+                logger.warning(f"[Gemini] 重建上下文缓存失败: {e}")
+                return False
+    
+    def _switch_to_fallback_model(self, from_model: Optional[str] = None) -> bool:
+        """
+        切换到备选模型
+        
+        Args:
+            from_model: 发起切换时所用的模型名；当前模型已不是它时说明其他线程已切换过，不再重复切换
+        
+        Returns:
+            是否成功切换
+        """
+        with self._model_lock:
+            if from_model is not None and self._current_model_name != from_model:
+                return True
+            try:
+                config = self._config
+                fallback_model = config.gemini_model_fallback
+                
+                logger.warning(f"[LLM] 切换到备选模型: {fallback_model}")
+                self._model = self._create_model(fallback_model)
+                self._current_model_name = fallback_model
+                self._using_fallback = True
+                logger.info(f"[LLM] 备选模型 {fallback_model} 初始化成功")
+                return True
+            except Exception as e:
+                logger.error(f"[LLM] 切换备选模型失败: {e}")
+                return False
+    
+    def close(self) -> None:
+        """删除 Gemini 上下文缓存并关闭共享的 HTTP 连接池（连接池在进程退出或对象回收时也会自动关闭）"""
+        self._release_prompt_cache()
+        if self._http_client is not None:
+            self._http_client.close()
     
     def is_available(self) -> bool:
-        """检查分析器是否可用"""
+        """检查分析器是否可用（首次调用时初始化客户端）"""
+        self._ensure_clients()
         return self._model is not None or self._openai_client is not None
     
+    def reload_config(self) -> None:
+        """
+        重新读取全局配置（配合 Config.reset_instance() 实现热更新）
+        
+        仅刷新请求间隔、重试、并发等运行参数，已初始化的模型/客户端不会重建
+        """
+        self._config = get_config()
+        self._backoff_schedule = self._build_backoff_schedule()
+    
+    def _build_backoff_schedule(self) -> tuple:
+        """重试退避时间表：第 n 次重试等待 base * 2^(n-1) 秒，最大 60 秒"""
+        config = self._config
+        return tuple(
+            min(config.gemini_retry_delay * (1 << i), 60) for i in range(max(1, config.gemini_max_retries))
+        )
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """
+        第 attempt 次重试前的等待时间
+        
+        在指数退避基础上叠加 0~30% 的随机抖动，避免并发分析在同一限流窗口内同时重试
+        """
+        schedule = self._backoff_schedule
+        delay = schedule[min(attempt, len(schedule)) - 1]
+        return delay + random.uniform(0, 0.3 * delay)
+    
+    def _record_rate_limit(self) -> None:
+        """记录一次 API 限流（可能在多个工作线程中同时调用）"""
+        with self._rate_limit_lock:
+            self._rate_limit_hits += 1
+    
+    def _retrying(self, label: str, after) -> Retrying:
+        """
+        构建重试控制器：最多 gemini_max_retries 次，指数退避 + 抖动，任何异常都重试
+        
+        Args:
+            label: 日志前缀（Gemini / OpenAI）
+            after: 每次失败后的回调（记录日志、切换模型等）
+        """
+        def log_sleep(retry_state) -> None:
+            logger.info(
+                f"[{label}] 第 {retry_state.attempt_number + 1} 次重试，"
+                f"等待 {retry_state.next_action.sleep:.1f} 秒..."
+            )
+        
+        return Retrying(
+            stop=stop_after_attempt(max(1, self._config.gemini_max_retries)),
+            wait=lambda retry_state: self._backoff_delay(retry_state.attempt_number),
+            retry=retry_if_exception_type(Exception),
+            after=after,
+            before_sleep=log_sleep,
+            reraise=True,
+        )
+    
+    def _request_openai(self, prompt: str, generation_config: dict) -> str:
+        """单次 OpenAI 兼容 API 请求"""
+        response = self._openai_client.chat.completions.create(
+            model=self._current_model_name,
+            messages=[
+                self.SYSTEM_MESSAGE,
+                {"role": "user", "content": prompt}
+            ],
+            temperature=generation_config.get('temperature', 0.7),
+            max_tokens=generation_config.get('max_output_tokens', 8192),
+        )
+        
+        # 记录 Prompt 缓存命中情况（系统提示词前缀命中时 cached_tokens > 0）
+        usage = getattr(response, 'usage', None)
+        details = getattr(usage, 'prompt_tokens_details', None)
+        if details is not None and getattr(details, 'cached_tokens', None) is not None:
+            logger.debug(f"[OpenAI] Prompt tokens: {usage.prompt_tokens}, 缓存命中: {details.cached_tokens}")
+        
+        if response and response.choices and response.choices[0].message.content:
+            return response.choices[0].message.content
+        raise ValueError("OpenAI API 返回空响应")
+    
+    def _request_gemini(self, model, prompt: str, generation_config: dict) -> str:
+        """单次 Gemini API 请求（model 为发起请求时的模型快照，期间可能被其他线程替换）"""
+        response = model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options={"timeout": 120}
+        )
+        
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None and self._prompt_cache is not None:
+            logger.debug(
+                f"[Gemini] Prompt tokens: {usage.prompt_token_count}, 上下文缓存命中: {usage.cached_content_token_count}"
+            )
+        
+        if response and response.text:
+            return response.text
+        raise ValueError("Gemini 返回空响应")
+    
     def _call_openai_api(self, prompt: str, generation_config: dict) -> str:
         """
-        调用 OpenAI 兼容 API
+        调用 OpenAI 兼容 API（带重试）
         
         Args:
             prompt: 提示词
@@ -531,46 +1626,70 @@ class GeminiAnalyzer:
         Returns:
             响应文本
         """
-        config = get_config()
-        max_retries = config.gemini_max_retries
-        base_delay = config.gemini_retry_delay
+        max_retries = self._config.gemini_max_retries
         
-        for attempt in range(max_retries):
-            try:
-                if attempt > 0:
-                    delay = base_delay * (2 ** (attempt - 1))
-                    delay = min(delay, 60)
-                    logger.info(f"[OpenAI] 第 {attempt + 1} 次重试，等待 {delay:.1f} 秒...")
-                    time.sleep(delay)
-                
-                response = self._openai_client.chat.completions.create(
-                    model=self._current_model_name,
-                    messages=[
-                        {"role": "system", "content": self.SYSTEM_PROMPT},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=generation_config.get('temperature', 0.7),
-                    max_tokens=generation_config.get('max_output_tokens', 8192),
-                )
-                
-                if response and response.choices and response.choices[0].message.content:
-                    return response.choices[0].message.content
-                else:
-                    raise ValueError("OpenAI API 返回空响应")
-                    
-            except Exception as e:
-                error_str = str(e)
-                is_rate_limit = '429' in error_str or 'rate' in error_str.lower() or 'quota' in error_str.lower()
-                
-                if is_rate_limit:
-                    logger.warning(f"[OpenAI] API 限流，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
-                else:
-                    logger.warning(f"[OpenAI] API 调用失败，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
+        def on_failure(retry_state) -> None:
+            error = retry_state.outcome.exception()
+            error_str = str(error)
+            attempt = retry_state.attempt_number
+            if _is_rate_limit_error(error):
+                self._record_rate_limit()
+                logger.warning(f"[OpenAI] API 限流，第 {attempt}/{max_retries} 次尝试: {error_str[:100]}")
+            else:
+                logger.warning(f"[OpenAI] API 调用失败，第 {attempt}/{max_retries} 次尝试: {error_str[:100]}")
+        
+        for attempt in self._retrying('OpenAI', on_failure):
+            with attempt:
+                return self._request_openai(prompt, generation_config)
+    
+    def _call_gemini_api(self, prompt: str, generation_config: dict) -> str:
+        """
+        调用 Gemini API（带重试）
+        
+        429 限流且已重试一半次数时切换到备选模型继续重试；
+        上下文缓存失效时重建模型后继续重试
+        
+        Args:
+            prompt: 提示词
+            generation_config: 生成配置
+            
+        Returns:
+            响应文本
+        """
+        max_retries = self._config.gemini_max_retries
+        tried_fallback = self._using_fallback
+        # 最近一次请求所用的上下文缓存名与模型名（由重试循环更新，on_failure 据此判断是否已被其他线程替换）
+        used_cache_name = used_model_name = None
+        
+        def on_failure(retry_state) -> None:
+            nonlocal tried_fallback
+            error = retry_state.outcome.exception()
+            error_str = str(error)
+            attempt = retry_state.attempt_number
+            
+            # 上下文缓存过期（TTL 到期或被清理），重建后直接进入下一次重试
+            if self._refresh_prompt_cache(error, used_cache_name):
+                return
+            
+            if _is_rate_limit_error(error):
+                self._record_rate_limit()
+                logger.warning(f"[Gemini] API 限流 (429)，第 {attempt}/{max_retries} 次尝试: {error_str[:100]}")
                 
-                if attempt == max_retries - 1:
-                    raise
+                # 如果已经重试了一半次数且还没切换过备选模型，尝试切换
+                if attempt - 1 >= max_retries // 2 and not tried_fallback:
+                    if self._switch_to_fallback_model(used_model_name):
+                        tried_fallback = True
+                        logger.info("[Gemini] 已切换到备选模型，继续重试")
+                    else:
+                        logger.warning("[Gemini] 切换备选模型失败，继续使用当前模型重试")
+            else:
+                # 非限流错误，记录并继续重试
+                logger.warning(f"[Gemini] API 调用失败，第 {attempt}/{max_retries} 次尝试: {error_str[:100]}")
         
-        raise Exception("OpenAI API 调用失败，已达最大重试次数")
+        for attempt in self._retrying('Gemini', on_failure):
+            with attempt:
+                model, used_cache_name, used_model_name = self._model_snapshot()
+                return self._request_gemini(model, prompt, generation_config)
     
     def _call_api_with_retry(self, prompt: str, generation_config: dict) -> str:
         """
@@ -590,84 +1709,104 @@ class GeminiAnalyzer:
         Returns:
             响应文本
         """
-        # 如果已经在使用 OpenAI 模式，直接调用 OpenAI
-        if self._use_openai:
-            return self._call_openai_api(prompt, generation_config)
-        
-        config = get_config()
-        max_retries = config.gemini_max_retries
-        base_delay = config.gemini_retry_delay
-        
-        last_error = None
-        tried_fallback = getattr(self, '_using_fallback', False)
-        
-        for attempt in range(max_retries):
-            try:
-                # 请求前增加延时（防止请求过快触发限流）
-                if attempt > 0:
-                    delay = base_delay * (2 ** (attempt - 1))  # 指数退避: 5, 10, 20, 40...
-                    delay = min(delay, 60)  # 最大60秒
-                    logger.info(f"[Gemini] 第 {attempt + 1} 次重试，等待 {delay:.1f} 秒...")
-                    time.sleep(delay)
-                
-                response = self._model.generate_content(
-                    prompt,
-                    generation_config=generation_config,
-                    request_options={"timeout": 120}
-                )
-                
-                if response and response.text:
-                    return response.text
-                else:
-                    raise ValueError("Gemini 返回空响应")
-                    
-            except Exception as e:
-                last_error = e
-                error_str = str(e)
-                
-                # 检查是否是 429 限流错误
-                is_rate_limit = '429' in error_str or 'quota' in error_str.lower() or 'rate' in error_str.lower()
-                
-                if is_rate_limit:
-                    logger.warning(f"[Gemini] API 限流 (429)，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
-                    
-                    # 如果已经重试了一半次数且还没切换过备选模型，尝试切换
-                    if attempt >= max_retries // 2 and not tried_fallback:
-                        if self._switch_to_fallback_model():
-                            tried_fallback = True
-                            logger.info("[Gemini] 已切换到备选模型，继续重试")
-                        else:
-                            logger.warning("[Gemini] 切换备选模型失败，继续使用当前模型重试")
-                else:
-                    # 非限流错误，记录并继续重试
-                    logger.warning(f"[Gemini] API 调用失败，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
+        return self._invoke(prompt, generation_config)
+    
+    def _invoke_gemini(self, prompt: str, generation_config: dict) -> str:
+        """Gemini 调用策略：Gemini（含备选模型）全部失败后回退到 OpenAI 兼容 API"""
+        try:
+            return self._call_gemini_api(prompt, generation_config)
+        except Exception as e:
+            last_error = e
         
         # Gemini 所有重试都失败，尝试 OpenAI 兼容 API
-        if self._openai_client:
+        config = self._config
+        if not self._openai_client and config.openai_api_key and config.openai_base_url:
+            # 尝试懒加载初始化 OpenAI
+            logger.warning("[Gemini] 所有重试失败，尝试初始化 OpenAI 兼容 API")
+            self._init_openai_fallback()
+        elif self._openai_client:
             logger.warning("[Gemini] 所有重试失败，切换到 OpenAI 兼容 API")
+        
+        if self._openai_client:
             try:
                 return self._call_openai_api(prompt, generation_config)
             except Exception as openai_error:
                 logger.error(f"[OpenAI] 备选 API 也失败: {openai_error}")
                 raise last_error or openai_error
-        elif config.openai_api_key and config.openai_base_url:
-            # 尝试懒加载初始化 OpenAI
-            logger.warning("[Gemini] 所有重试失败，尝试初始化 OpenAI 兼容 API")
-            self._init_openai_fallback()
-            if self._openai_client:
-                try:
-                    return self._call_openai_api(prompt, generation_config)
-                except Exception as openai_error:
-                    logger.error(f"[OpenAI] 备选 API 也失败: {openai_error}")
-                    raise last_error or openai_error
         
         # 所有方式都失败
-        raise last_error or Exception("所有 AI API 调用失败，已达最大重试次数")
+        raise last_error
+    
+    def _stream_api(self, prompt: str, generation_config: dict) -> Iterator[str]:
+        """
+        流式调用 AI API，逐个产出响应文本分片
+        
+        在收到任何分片之前失败（如接口不支持流式），回退到带重试的非流式调用，
+        一次性产出完整响应；收到分片之后的错误直接抛出
+        
+        Args:
+            prompt: 提示词
+            generation_config: 生成配置
+            
+        Yields:
+            响应文本分片
+        """
+        received = False
+        chunks = self._invoke_stream(prompt, generation_config)
+        try:
+            for text in chunks:
+                received = True
+                yield text
+        except Exception as e:
+            if received:
+                raise
+            logger.warning(f"[LLM] 流式调用失败，回退到非流式调用: {str(e)[:100]}")
+            yield self._call_api_with_retry(prompt, generation_config)
+        finally:
+            chunks.close()
+    
+    def _stream_gemini(self, prompt: str, generation_config: dict) -> Iterator[str]:
+        """Gemini 流式调用"""
+        response = self._model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options={"timeout": 120},
+            stream=True,
+        )
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # 分片不含文本（如仅携带 finish_reason）
+                continue
+            if text:
+                yield text
+    
+    def _stream_openai(self, prompt: str, generation_config: dict) -> Iterator[str]:
+        """OpenAI 兼容 API 流式调用"""
+        stream = self._openai_client.chat.completions.create(
+            model=self._current_model_name,
+            messages=[
+                self.SYSTEM_MESSAGE,
+                {"role": "user", "content": prompt}
+            ],
+            temperature=generation_config.get('temperature', 0.7),
+            max_tokens=generation_config.get('max_output_tokens', 8192),
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # 提前结束时关闭连接
+            stream.close()
     
     def analyze(
         self, 
         context: Dict[str, Any],
-        news_context: Optional[str] = None
+        news_context: Optional[str] = None,
+        include_raw: bool = False
     ) -> AnalysisResult:
         """
         分析单只股票
@@ -681,70 +1820,34 @@ class GeminiAnalyzer:
         Args:
             context: 从 storage.get_analysis_context() 获取的上下文数据
             news_context: 预先搜索的新闻内容（可选）
+            include_raw: 是否在结果中保留原始响应文本（DEBUG 日志级别下总是保留）
             
         Returns:
-            AnalysisResult 对象
-        """
-        code = context.get('code', 'Unknown')
-        config = get_config()
-        
-        # 请求前增加延时（防止连续请求触发限流）
-        request_delay = config.gemini_request_delay
-        if request_delay > 0:
-            logger.debug(f"[LLM] 请求前等待 {request_delay:.1f} 秒...")
-            time.sleep(request_delay)
-        
-        # 优先从上下文获取股票名称（由 main.py 传入）
-        name = context.get('stock_name')
-        if not name or name.startswith('股票'):
-            # 备选：从 realtime 中获取
-            if 'realtime' in context and context['realtime'].get('name'):
-                name = context['realtime']['name']
-            else:
-                # 最后从映射表获取
-                name = STOCK_NAME_MAP.get(code, f'股票{code}')
+            AnalysisResult 对象
+        """
+        code = context.get('code', 'Unknown')
+        name = self._resolve_name(context, code)
         
         # 如果模型不可用，返回默认结果
         if not self.is_available():
-            return AnalysisResult(
-                code=code,
-                name=name,
-                sentiment_score=50,
-                trend_prediction='震荡',
-                operation_advice='持有',
-                confidence_level='低',
-                analysis_summary='AI 分析功能未启用（未配置 API Key）',
-                risk_warning='请配置 Gemini API Key 后重试',
-                success=False,
-                error_message='Gemini API Key 未配置',
-            )
+            return self._build_unavailable_result(code, name)
         
         try:
             # 格式化输入（包含技术面数据和新闻）
             prompt = self._format_prompt(context, name, news_context)
+            self._log_prompt(prompt, code, name, news_context)
             
-            # 获取模型名称
-            model_name = getattr(self, '_current_model_name', None)
-            if not model_name:
-                model_name = getattr(self._model, '_model_name', 'unknown')
-                if hasattr(self._model, 'model_name'):
-                    model_name = self._model.model_name
+            # 相同 Prompt 命中缓存时直接复用上次的响应
+            cache_key = self.cache.make_key(prompt, self._current_model_name, self.PROMPT_VERSION)
+            cached_text = self.cache.get(cache_key)
+            if cached_text is not None:
+                logger.info(f"[LLM缓存] {name}({code}) 命中缓存，跳过 API 调用")
+                return self._finalize_result(cached_text, context, code, name, news_context, include_raw)
             
-            logger.info(f"========== AI 分析 {name}({code}) ==========")
-            logger.info(f"[LLM配置] 模型: {model_name}")
-            logger.info(f"[LLM配置] Prompt 长度: {len(prompt)} 字符")
-            logger.info(f"[LLM配置] 是否包含新闻: {'是' if news_context else '否'}")
-            
-            # 记录完整 prompt 到日志（INFO级别记录摘要，DEBUG记录完整）
-            prompt_preview = prompt[:500] + "..." if len(prompt) > 500 else prompt
-            logger.info(f"[LLM Prompt 预览]\n{prompt_preview}")
-            logger.debug(f"=== 完整 Prompt ({len(prompt)}字符) ===\n{prompt}\n=== End Prompt ===")
+            self._wait_request_delay()
             
             # 设置生成配置
-            generation_config = {
-                "temperature": 0.7,
-                "max_output_tokens": 8192,
-            }
+            generation_config = dict(self.GENERATION_CONFIG)
             
             logger.info(f"[LLM调用] 开始调用 Gemini API (temperature={generation_config['temperature']}, max_tokens={generation_config['max_output_tokens']})...")
             
@@ -761,87 +1864,242 @@ class GeminiAnalyzer:
             logger.info(f"[LLM返回 预览]\n{response_preview}")
             logger.debug(f"=== Gemini 完整响应 ({len(response_text)}字符) ===\n{response_text}\n=== End Response ===")
             
-            # 解析响应
-            result = self._parse_response(response_text, code, name)
-            result.raw_response = response_text
-            result.search_performed = bool(news_context)
+            result = self._finalize_result(response_text, context, code, name, news_context, include_raw)
+            logger.info(f"[LLM解析] {name}({code}) 分析完成: {result.trend_prediction}, 评分 {result.sentiment_score}")
             
-            # [CRITICAL Fix] 强制注入 Python 计算的真实股息率数据（防止 AI 幻觉或遗漏）
-            try:
-                if 'dividend_analysis' in context:
-                    calc_div = context['dividend_analysis']
-                    if result.dashboard is None:
-                        result.dashboard = {}
-                    
-                    if 'dividend_analysis' not in result.dashboard:
-                        result.dashboard['dividend_analysis'] = {}
-                    
-                    # 覆盖数值 (确保前端显示正确数值)
-                    yield_val = calc_div.get('expected_yield', 0)
-                    result.dashboard['dividend_analysis']['dividend_yield'] = yield_val
-                    
-                    # 补充算理 (AI 的评论可能太泛，补充 Python 的精确逻辑)
-                    ai_comment = result.dashboard['dividend_analysis'].get('dividend_comment', '')
-                    calc_reason = calc_div.get('reason', '')
-                    # 如果 AI 没写或者不一样，追加说明
-                    combined_comment = f"{ai_comment} [算法确证: {calc_reason}]".strip()
-                    result.dashboard['dividend_analysis']['dividend_comment'] = combined_comment
-                    
-                    logger.info(f"已强制注入股息率数据: {yield_val}%")
-            except Exception as div_err:
-                logger.warning(f"股息率数据注入失败: {div_err}")
-
-            # [CRITICAL Fix] 强制注入估值/同业/筹码等Python数据（确保报告展示）
+            if result.success:
+                self.cache.set(cache_key, response_text)
+            return result
+            
+        except Exception as e:
+            logger.error(f"AI 分析 {name}({code}) 失败: {e}")
+            return self._build_error_result(code, name, e)
+    
+    def analyze_stream(
+        self, 
+        context: Dict[str, Any],
+        news_context: Optional[str] = None,
+        include_raw: bool = False
+    ) -> Iterator[AnalysisResult]:
+        """
+        流式分析单只股票
+        
+        边接收边解析：每收到一个响应分片就尝试对已收到的内容做部分 JSON 解析
+        （需要 jiter），产出当前的部分结果快照，便于调用方尽早展示进度。
+        最后一次产出的是与 analyze() 等价的完整结果。
+        
+        Args:
+            context: 从 storage.get_analysis_context() 获取的上下文数据
+            news_context: 预先搜索的新闻内容（可选）
+            include_raw: 是否在完整结果中保留原始响应文本（DEBUG 日志级别下总是保留）
+            
+        Yields:
+            AnalysisResult 对象（部分快照，最后一个为完整结果）
+        """
+        code = context.get('code', 'Unknown')
+        name = self._resolve_name(context, code)
+        
+        if not self.is_available():
+            yield self._build_unavailable_result(code, name)
+            return
+        
+        try:
+            prompt = self._format_prompt(context, name, news_context)
+            self._log_prompt(prompt, code, name, news_context)
+            
+            cache_key = self.cache.make_key(prompt, self._current_model_name, self.PROMPT_VERSION)
+            cached_text = self.cache.get(cache_key)
+            if cached_text is not None:
+                logger.info(f"[LLM缓存] {name}({code}) 命中缓存，跳过 API 调用")
+                yield self._finalize_result(cached_text, context, code, name, news_context, include_raw)
+                return
+            
+            self._wait_request_delay()
+            generation_config = dict(self.GENERATION_CONFIG)
+            
+            start_time = time.time()
+            parts: List[str] = []
+            tracker = _JsonSpanTracker()
+            parsed_members = 0
+            chunks = self._stream_api(prompt, generation_config)
             try:
+                for chunk_text in chunks:
+                    parts.append(chunk_text)
+                    if tracker.feed(chunk_text):
+                        # 顶层 JSON 已闭合，后续内容无需等待，提前结束接收
+                        break
+                    # 每次部分解析都要从头解析整个缓冲区，只在有新的顶层字段完成时才解析，
+                    # 避免逐分片解析带来的 O(n²) 开销
+                    if tracker.members == parsed_members:
+                        continue
+                    parsed_members = tracker.members
+                    partial = self._parse_partial(''.join(parts), code, name)
+                    if partial is not None:
+                        yield partial
+            finally:
+                chunks.close()
+            
+            response_text = ''.join(parts)
+            if not response_text:
+                raise ValueError("LLM 流式响应为空")
+            logger.info(f"[LLM返回] 流式响应完成, 耗时 {time.time() - start_time:.2f}s, 响应长度 {len(response_text)} 字符")
+            logger.debug(f"=== 完整响应 ({len(response_text)}字符) ===\n{response_text}\n=== End Response ===")
+            
+            result = self._finalize_result(response_text, context, code, name, news_context, include_raw)
+            logger.info(f"[LLM解析] {name}({code}) 分析完成: {result.trend_prediction}, 评分 {result.sentiment_score}")
+            if result.success:
+                self.cache.set(cache_key, response_text)
+            yield result
+            
+        except Exception as e:
+            logger.error(f"AI 分析 {name}({code}) 失败: {e}")
+            yield self._build_error_result(code, name, e)
+    
+    def _wait_request_delay(self) -> None:
+        """请求前增加延时（防止连续请求触发限流）"""
+        request_delay = self._config.gemini_request_delay
+        if request_delay > 0:
+            logger.debug(f"[LLM] 请求前等待 {request_delay:.1f} 秒...")
+            time.sleep(request_delay)
+    
+    @staticmethod
+    def _resolve_name(context: Dict[str, Any], code: str) -> str:
+        """
+        解析股票名称：上下文 > 实时行情 > 映射表
+        
+        以"股票"开头的名称视为 main.py 传入的占位名（如 股票600519），继续向后查找
+        """
+        name = context.get('stock_name')
+        if name and not name.startswith('股票'):
+            return name
+        return (context.get('realtime') or {}).get('name') or _NAME_MAP.get(code) or f'股票{code}'
+    
+    def _log_prompt(self, prompt: str, code: str, name: str, news_context: Optional[str]) -> None:
+        """记录模型配置与 Prompt（INFO级别记录摘要，DEBUG记录完整）"""
+        # 获取模型名称
+        model_name = getattr(self, '_current_model_name', None)
+        if not model_name:
+            model_name = getattr(self._model, '_model_name', 'unknown')
+            if hasattr(self._model, 'model_name'):
+                model_name = self._model.model_name
+        
+        logger.info(f"========== AI 分析 {name}({code}) ==========")
+        logger.info(f"[LLM配置] 模型: {model_name}")
+        logger.info(f"[LLM配置] Prompt 长度: {len(prompt)} 字符")
+        logger.info(f"[LLM配置] 是否包含新闻: {'是' if news_context else '否'}")
+        
+        prompt_preview = prompt[:500] + "..." if len(prompt) > 500 else prompt
+        logger.info(f"[LLM Prompt 预览]\n{prompt_preview}")
+        logger.debug(f"=== 完整 Prompt ({len(prompt)}字符) ===\n{prompt}\n=== End Prompt ===")
+    
+    def _build_unavailable_result(self, code: str, name: str) -> AnalysisResult:
+        """模型不可用时的默认结果"""
+        return AnalysisResult(
+            code=code,
+            name=name,
+            sentiment_score=50,
+            trend_prediction='震荡',
+            operation_advice='持有',
+            confidence_level='低',
+            analysis_summary='AI 分析功能未启用（未配置 API Key）',
+            risk_warning='请配置 Gemini API Key 后重试',
+            success=False,
+            error_message='Gemini API Key 未配置',
+        )
+    
+    def _build_error_result(self, code: str, name: str, error: Exception) -> AnalysisResult:
+        """分析出错时的默认结果"""
+        return AnalysisResult(
+            code=code,
+            name=name,
+            sentiment_score=50,
+            trend_prediction='震荡',
+            operation_advice='持有',
+            confidence_level='低',
+            analysis_summary=f'分析过程出错: {str(error)[:100]}',
+            risk_warning='分析失败，请稍后重试或手动分析',
+            success=False,
+            error_message=str(error),
+        )
+    
+    def _finalize_result(
+        self,
+        response_text: str,
+        context: Dict[str, Any],
+        code: str,
+        name: str,
+        news_context: Optional[str] = None,
+        include_raw: bool = False
+    ) -> AnalysisResult:
+        """解析完整响应，并注入 Python 侧计算的数据"""
+        # 解析响应
+        result = self._parse_response(response_text, code, name)
+        # 原始响应（可达 8KB）仅在需要时保留，避免批量结果常驻内存
+        if include_raw or logger.isEnabledFor(logging.DEBUG):
+            result.raw_response = response_text
+        else:
+            result.raw_response = None
+        result.search_performed = bool(news_context)
+        
+        # [CRITICAL Fix] 强制注入 Python 计算的真实股息率数据（防止 AI 幻觉或遗漏）
+        try:
+            if 'dividend_analysis' in context:
+                calc_div = context['dividend_analysis']
                 if result.dashboard is None:
                     result.dashboard = {}
-                    
-                # 注入10年PE分位数据
-                if 'valuation_history' in context and context['valuation_history']:
-                    result.dashboard['valuation_history'] = context['valuation_history']
-                    logger.debug(f"已注入估值历史数据: PE分位={context['valuation_history'].get('pe_rank_10y', 0):.1f}%")
                 
-                # 注入同业比价数据
-                if 'peer_comparison' in context and context['peer_comparison']:
-                    result.dashboard['peer_comparison'] = context['peer_comparison']
-                    logger.debug(f"已注入同业比价数据")
+                if 'dividend_analysis' not in result.dashboard:
+                    result.dashboard['dividend_analysis'] = {}
                 
-                # 注入筹码分布数据
-                if 'chip' in context and context['chip']:
-                    result.dashboard['chip_data'] = context['chip']
-                    logger.debug(f"已注入筹码数据")
+                # 覆盖数值 (确保前端显示正确数值)
+                yield_val = calc_div.get('expected_yield', 0)
+                result.dashboard['dividend_analysis']['dividend_yield'] = yield_val
                 
-                # 注入实时行情数据
-                if 'realtime' in context and context['realtime']:
-                    result.dashboard['realtime'] = context['realtime']
-                    logger.debug(f"已注入实时行情数据")
+                # 补充算理 (AI 的评论可能太泛，补充 Python 的精确逻辑)
+                ai_comment = result.dashboard['dividend_analysis'].get('dividend_comment', '')
+                calc_reason = calc_div.get('reason', '')
+                # 如果 AI 没写或者不一样，追加说明
+                combined_comment = f"{ai_comment} [算法确证: {calc_reason}]".strip()
+                result.dashboard['dividend_analysis']['dividend_comment'] = combined_comment
                 
-                # 注入买点分析数据
-                if 'buy_point' in context and context['buy_point']:
-                    result.dashboard['buy_point'] = context['buy_point']
-                    logger.info(f"已注入买点分析数据: {context['buy_point'].get('label', '')} {context['buy_point'].get('label_text', '')}")
-                    
-            except Exception as inject_err:
-                logger.warning(f"扩展数据注入失败: {inject_err}")
+                logger.info(f"已强制注入股息率数据: {yield_val}%")
+        except Exception as div_err:
+            logger.warning(f"股息率数据注入失败: {div_err}")
 
-            logger.info(f"[LLM解析] {name}({code}) 分析完成: {result.trend_prediction}, 评分 {result.sentiment_score}")
+        # [CRITICAL Fix] 强制注入估值/同业/筹码等Python数据（确保报告展示）
+        try:
+            if result.dashboard is None:
+                result.dashboard = {}
+                
+            # 注入10年PE分位数据
+            if 'valuation_history' in context and context['valuation_history']:
+                result.dashboard['valuation_history'] = context['valuation_history']
+                logger.debug(f"已注入估值历史数据: PE分位={context['valuation_history'].get('pe_rank_10y', 0):.1f}%")
             
-            return result
+            # 注入同业比价数据
+            if 'peer_comparison' in context and context['peer_comparison']:
+                result.dashboard['peer_comparison'] = context['peer_comparison']
+                logger.debug(f"已注入同业比价数据")
             
-        except Exception as e:
-            logger.error(f"AI 分析 {name}({code}) 失败: {e}")
-            return AnalysisResult(
-                code=code,
-                name=name,
-                sentiment_score=50,
-                trend_prediction='震荡',
-                operation_advice='持有',
-                confidence_level='低',
-                analysis_summary=f'分析过程出错: {str(e)[:100]}',
-                risk_warning='分析失败，请稍后重试或手动分析',
-                success=False,
-                error_message=str(e),
-            )
+            # 注入筹码分布数据
+            if 'chip' in context and context['chip']:
+                result.dashboard['chip_data'] = context['chip']
+                logger.debug(f"已注入筹码数据")
+            
+            # 注入实时行情数据
+            if 'realtime' in context and context['realtime']:
+                result.dashboard['realtime'] = context['realtime']
+                logger.debug(f"已注入实时行情数据")
+            
+            # 注入买点分析数据
+            if 'buy_point' in context and context['buy_point']:
+                result.dashboard['buy_point'] = context['buy_point']
+                logger.info(f"已注入买点分析数据: {context['buy_point'].get('label', '')} {context['buy_point'].get('label_text', '')}")
+                
+        except Exception as inject_err:
+            logger.warning(f"扩展数据注入失败: {inject_err}")
+
+        return result
     
     def _format_prompt(
         self, 
@@ -864,235 +2122,93 @@ class GeminiAnalyzer:
         # 优先使用上下文中的股票名称（从 realtime_quote 获取）
         stock_name = context.get('stock_name', name)
         if not stock_name or stock_name == f'股票{code}':
-            stock_name = STOCK_NAME_MAP.get(code, f'股票{code}')
+            stock_name = _NAME_MAP.get(code, f'股票{code}')
             
         today = context.get('today', {})
         
         # ========== 构建决策仪表盘格式的输入 ==========
-        prompt = f"""# 决策仪表盘分析请求
-
-## 📊 股票基础信息
-| 项目 | 数据 |
-|------|------|
-| 股票代码 | **{code}** |
-| 股票名称 | **{stock_name}** |
-| 分析日期 | {context.get('date', '未知')} |
-
----
-
-## 📈 技术面数据
-
-### 今日行情
-| 指标 | 数值 |
-|------|------|
-| 收盘价 | {today.get('close', 'N/A')} 元 |
-| 开盘价 | {today.get('open', 'N/A')} 元 |
-| 最高价 | {today.get('high', 'N/A')} 元 |
-| 最低价 | {today.get('low', 'N/A')} 元 |
-| 涨跌幅 | {today.get('pct_chg', 'N/A')}% |
-| 成交量 | {self._format_volume(today.get('volume'))} |
-| 成交额 | {self._format_amount(today.get('amount'))} |
-
-### 均线系统（关键判断指标）
-| 均线 | 数值 | 说明 |
-|------|------|------|
-| MA5 | {today.get('ma5', 'N/A')} | 短期趋势线 |
-| MA10 | {today.get('ma10', 'N/A')} | 中短期趋势线 |
-| MA20 | {today.get('ma20', 'N/A')} | 中期趋势线 |
-| 均线形态 | {context.get('ma_status', '未知')} | 多头/空头/缠绕 |
-"""
+        # 各段落按模板填充后追加到列表，最后一次性拼接
+        parts = [_PROMPT_HEADER_TMPL.format(
+            code=code,
+            stock_name=stock_name,
+            date=context.get('date', '未知'),
+            close=today.get('close', 'N/A'),
+            open=today.get('open', 'N/A'),
+            high=today.get('high', 'N/A'),
+            low=today.get('low', 'N/A'),
+            pct_chg=today.get('pct_chg', 'N/A'),
+            volume=self._format_volume(today.get('volume')),
+            amount=self._format_amount(today.get('amount')),
+            ma5=today.get('ma5', 'N/A'),
+            ma10=today.get('ma10', 'N/A'),
+            ma20=today.get('ma20', 'N/A'),
+            ma_status=context.get('ma_status', '未知'),
+        )]
         
         # 添加实时行情数据（量比、换手率等）
         if 'realtime' in context:
-            rt = context['realtime']
-            prompt += f"""
-### 实时行情增强数据
-| 指标 | 数值 | 解读 |
-|------|------|------|
-| 当前价格 | {rt.get('price', 'N/A')} 元 | |
-| **量比** | **{rt.get('volume_ratio', 'N/A')}** | {rt.get('volume_ratio_desc', '')} |
-| **换手率** | **{rt.get('turnover_rate', 'N/A')}%** | |
-| 市盈率(动态) | {rt.get('pe_ratio', 'N/A')} | |
-| 市净率 | {rt.get('pb_ratio', 'N/A')} | |
-| 总市值 | {self._format_amount(rt.get('total_mv'))} | |
-| 流通市值 | {self._format_amount(rt.get('circ_mv'))} | |
-| 60日涨跌幅 | {rt.get('change_60d', 'N/A')}% | 中期表现 |
-"""
+            parts.append(_render_section(_render_realtime, context['realtime']))
         
         # 添加筹码分布数据
         if 'chip' in context:
-            chip = context['chip']
-            profit_ratio = chip.get('profit_ratio', 0)
-            prompt += f"""
-### 筹码分布数据（效率指标）
-| 指标 | 数值 | 健康标准 |
-|------|------|----------|
-| **获利比例** | **{profit_ratio:.1%}** | 70-90%时警惕 |
-| 平均成本 | {chip.get('avg_cost', 'N/A')} 元 | 现价应高于5-15% |
-| 90%筹码集中度 | {chip.get('concentration_90', 0):.2%} | <15%为集中 |
-| 70%筹码集中度 | {chip.get('concentration_70', 0):.2%} | |
-| 筹码状态 | {chip.get('chip_status', '未知')} | |
-"""
+            parts.append(_render_section(_render_chip, context['chip']))
 
         # 添加 Dang氏股息分析结果
         if 'dividend_analysis' in context:
-            div = context['dividend_analysis']
-            prompt += f"""
-### 💰 Dang氏预期股息分析
-| 指标 | 数值 | 判定标准 |
-|------|------|----------|
-| **预期股息率** | **{div.get('expected_yield', 0):.2f}%** | >5%为优质生产资料 |
-| 计算逻辑 | {div.get('reason', 'N/A')} | |
-"""
+            parts.append(_render_section(_render_dividend, context['dividend_analysis']))
 
         # 添加历史估值分位 (V4.0 Upgrade)
         if 'valuation_history' in context and context['valuation_history']:
-            val_hist = context['valuation_history']
-            prompt += f"""
-### 📊 绝对估值安全度 (纵向历史)
-| 指标 | 当前值 | 10年分位 | 判定 |
-|------|--------|----------|------|
-| **PE(TTM)** | **{val_hist.get('current_pe', 0):.2f}** | **{val_hist.get('pe_rank_10y', 0):.1f}%** | {"✅ 底部区域" if val_hist.get('pe_rank_10y', 0)<20 else "⚠️ 偏高"} |
-"""
+            parts.append(_render_section(_render_valuation, context['valuation_history']))
 
         # 添加同业比价 (V4.0 Upgrade)
         if 'peer_comparison' in context and context['peer_comparison']:
-            peers = context['peer_comparison']
-            prompt += f"""
-### 👥 同业比价 (横向对比)
-| 行业 | 行业中位PE | 行业龙头 |
-|------|------------|----------|
-| {peers.get('industry', '未知')} | {peers.get('avg_pe', 0):.2f} | {', '.join(peers.get('top_peers', [])[:3])} |
-
-*注：请将当前PE与行业中位PE对比，计算折价率。*
-"""
+            parts.append(_render_section(_render_peer, context['peer_comparison']))
         
         # 添加趋势分析结果（基于交易理念的预判）
         if 'trend_analysis' in context:
-            trend = context['trend_analysis']
-            bias_warning = "🚨 超过5%，严禁追高！" if trend.get('bias_ma5', 0) > 5 else "✅ 安全范围"
-            prompt += f"""
-### 趋势分析预判（基于交易理念）
-| 指标 | 数值 | 判定 |
-|------|------|------|
-| 趋势状态 | {trend.get('trend_status', '未知')} | |
-| 均线排列 | {trend.get('ma_alignment', '未知')} | MA5>MA10>MA20为多头 |
-| 趋势强度 | {trend.get('trend_strength', 0)}/100 | |
-| **乖离率(MA5)** | **{trend.get('bias_ma5', 0):+.2f}%** | {bias_warning} |
-| 乖离率(MA10) | {trend.get('bias_ma10', 0):+.2f}% | |
-| 量能状态 | {trend.get('volume_status', '未知')} | {trend.get('volume_trend', '')} |
-| 系统信号 | {trend.get('buy_signal', '未知')} | |
-| 系统评分 | {trend.get('signal_score', 0)}/100 | |
-
-#### 系统分析理由
-**买入理由**：
-{chr(10).join('- ' + r for r in trend.get('signal_reasons', ['无'])) if trend.get('signal_reasons') else '- 无'}
-
-**风险因素**：
-{chr(10).join('- ' + r for r in trend.get('risk_factors', ['无'])) if trend.get('risk_factors') else '- 无'}
-"""
+            parts.append(_render_section(_render_trend, context['trend_analysis']))
 
         # 添加买点分析数据（MA120 加分机制）
         if 'buy_point' in context and context['buy_point']:
-            bp = context['buy_point']
-            prompt += f"""
-### 📊 技术买点分析（MA120加分机制）
-| 指标 | 数值 | 说明 |
-|------|------|------|
-| **综合评级** | **{bp.get('label', '')} {bp.get('label_text', '')}** | ⭐最佳/🟢良好/🟡观望/🔴规避 |
-| 短期信号 | {bp.get('short_signal', '无')} | {bp.get('short_signal_detail', '')} |
-| MA120状态 | {bp.get('ma120_status', 'N/A')} | 偏离度 {bp.get('ma120_deviation', 0):+.1f}% |
-| 半年线MA120 | {bp.get('ma120', 'N/A')}元 | 价值区分界线 |
-| 当前价格 | {bp.get('current_price', 'N/A')}元 | |
-| 量比 | {bp.get('volume_ratio', 'N/A')} | |
-
-**📌 系统建议**：{bp.get('current_advice', '无')}
-
-**关键价位**：
-- 加仓位：{bp.get('add_price', 'N/A')}元
-- 止盈位：{bp.get('take_profit_price', 'N/A')}元  
-- 止损位：{bp.get('stop_loss_price', 'N/A')}元
-
-*请综合MA120位置（低于MA120加分）和短期信号（缩量回踩/放量突破）给出最终建议。*
-"""
+            parts.append(_render_section(_render_buy_point, context['buy_point']))
         
         # 添加昨日对比数据
         if 'yesterday' in context:
-            volume_change = context.get('volume_change_ratio', 'N/A')
-            prompt += f"""
-### 量价变化
-- 成交量较昨日变化：{volume_change}倍
-- 价格较昨日变化：{context.get('price_change_ratio', 'N/A')}%
-"""
+            parts.append(_PROMPT_YESTERDAY_TMPL.format(
+                volume_change=context.get('volume_change_ratio', 'N/A'),
+                price_change=context.get('price_change_ratio', 'N/A'),
+            ))
         
         # 添加新闻搜索结果（重点区域）
-        prompt += """
----
-
-## 📰 舆情情报
-"""
+        parts.append(_PROMPT_NEWS_HEADER)
         if news_context:
-            prompt += f"""
-以下是 **{stock_name}({code})** 近7日的新闻搜索结果，请重点提取：
-1. 🚨 **风险警报**：减持、处罚、利空
-2. 🎯 **利好催化**：业绩、合同、政策
-3. 📊 **业绩预期**：年报预告、业绩快报
-
-```
-{news_context}
-```
-"""
+            parts.append(_PROMPT_NEWS_TMPL.format(stock_name=stock_name, code=code, news_context=news_context))
         else:
-            prompt += """
-未搜索到该股票近期的相关新闻。请主要依据技术面数据进行分析。
-"""
+            parts.append(_PROMPT_NO_NEWS)
         
         # 明确的输出要求
-        prompt += f"""
----
-
-## ✅ 分析任务
-
-请为 **{stock_name}({code})** 生成【决策仪表盘】，严格按照 JSON 格式输出。
-
-### 重点关注（必须明确回答）：
-1. ❓ 是否满足 MA5>MA10>MA20 多头排列？
-2. ❓ 当前乖离率是否在安全范围内（<5%）？—— 超过5%必须标注"严禁追高"
-3. ❓ 量能是否配合（缩量回调/放量突破）？
-4. ❓ 筹码结构是否健康？
-5. ❓ 消息面有无重大利空？（减持、处罚、业绩变脸等）
-
-### 决策仪表盘要求：
-- **核心结论**：一句话说清该买/该卖/该等
-- **持仓分类建议**：空仓者怎么做 vs 持仓者怎么做
-- **具体狙击点位**：买入价、止损价、目标价（精确到分）
-- **检查清单**：每项用 ✅/⚠️/❌ 标记
-
-请输出完整的 JSON 格式决策仪表盘。"""
+        parts.append(_PROMPT_TASK_TMPL.format(stock_name=stock_name, code=code))
         
-        return prompt
+        return ''.join(parts)
     
     def _format_volume(self, volume: Optional[float]) -> str:
         """格式化成交量显示"""
-        if volume is None:
-            return 'N/A'
-        if volume >= 1e8:
-            return f"{volume / 1e8:.2f} 亿股"
-        elif volume >= 1e4:
-            return f"{volume / 1e4:.2f} 万股"
-        else:
-            return f"{volume:.0f} 股"
+        return _format_scaled(volume, _VOLUME_SUFFIXES)
     
     def _format_amount(self, amount: Optional[float]) -> str:
         """格式化成交额显示"""
-        if amount is None:
-            return 'N/A'
-        if amount >= 1e8:
-            return f"{amount / 1e8:.2f} 亿元"
-        elif amount >= 1e4:
-            return f"{amount / 1e4:.2f} 万元"
-        else:
-            return f"{amount:.0f} 元"
+        return _format_scaled(amount, _AMOUNT_SUFFIXES)
+    
+    @staticmethod
+    def _format_volume_vec(volumes) -> List[str]:
+        """批量格式化成交量（一次性计算整列的量级）"""
+        return _format_scaled_vec(volumes, _VOLUME_SUFFIXES)
+    
+    @staticmethod
+    def _format_amount_vec(amounts) -> List[str]:
+        """批量格式化成交额（一次性计算整列的量级）"""
+        return _format_scaled_vec(amounts, _AMOUNT_SUFFIXES)
     
     def _parse_response(
         self, 
@@ -1107,16 +2223,16 @@ class GeminiAnalyzer:
         如果解析失败，尝试智能提取或返回默认结果
         """
         try:
-            # 清理响应文本：移除 markdown 代码块标记
-            cleaned_text = response_text
-            if '```json' in cleaned_text:
-                cleaned_text = cleaned_text.replace('```json', '').replace('```', '')
-            elif '```' in cleaned_text:
-                cleaned_text = cleaned_text.replace('```', '')
+            # 优先提取 markdown 代码块中的 JSON
+            block = _JSON_BLOCK_RE.search(response_text)
+            if block:
+                cleaned_text = block.group(1)
+            else:
+                # 清理响应文本：移除 markdown 代码块标记
+                cleaned_text = response_text.replace('```json', '').replace('```', '')
             
             # 尝试找到 JSON 内容
-            json_start = cleaned_text.find('{')
-            json_end = cleaned_text.rfind('}') + 1
+            json_start, json_end = _extract_json_span(cleaned_text)
             
             if json_start >= 0 and json_end > json_start:
                 json_str = cleaned_text[json_start:json_end]
@@ -1124,49 +2240,9 @@ class GeminiAnalyzer:
                 # 尝试修复常见的 JSON 问题
                 json_str = self._fix_json_string(json_str)
                 
-                data = json.loads(json_str)
+                data = _json_loads(json_str)
                 
-                # 提取 dashboard 数据
-                dashboard = data.get('dashboard', None)
-                
-                # 解析所有字段，使用默认值防止缺失
-                return AnalysisResult(
-                    code=code,
-                    name=name,
-                    # 核心指标
-                    sentiment_score=int(data.get('sentiment_score', 50)),
-                    trend_prediction=data.get('trend_prediction', '震荡'),
-                    operation_advice=data.get('operation_advice', '持有'),
-                    confidence_level=data.get('confidence_level', '中'),
-                    # 决策仪表盘
-                    dashboard=dashboard,
-                    # 走势分析
-                    trend_analysis=data.get('trend_analysis', ''),
-                    short_term_outlook=data.get('short_term_outlook', ''),
-                    medium_term_outlook=data.get('medium_term_outlook', ''),
-                    # 技术面
-                    technical_analysis=data.get('technical_analysis', ''),
-                    ma_analysis=data.get('ma_analysis', ''),
-                    volume_analysis=data.get('volume_analysis', ''),
-                    pattern_analysis=data.get('pattern_analysis', ''),
-                    # 基本面
-                    fundamental_analysis=data.get('fundamental_analysis', ''),
-                    sector_position=data.get('sector_position', ''),
-                    company_highlights=data.get('company_highlights', ''),
-                    # 情绪面/消息面
-                    news_summary=data.get('news_summary', ''),
-                    market_sentiment=data.get('market_sentiment', ''),
-                    hot_topics=data.get('hot_topics', ''),
-                    # 综合
-                    analysis_summary=data.get('analysis_summary', '分析完成'),
-                    key_points=data.get('key_points', ''),
-                    risk_warning=data.get('risk_warning', ''),
-                    buy_reason=data.get('buy_reason', ''),
-                    # 元数据
-                    search_performed=data.get('search_performed', False),
-                    data_sources=data.get('data_sources', '技术面数据'),
-                    success=True,
-                )
+                return self._result_from_data(data, code, name)
             else:
                 # 没有找到 JSON，尝试从纯文本中提取信息
                 logger.warning(f"无法从响应中提取 JSON，使用原始文本分析")
@@ -1176,22 +2252,77 @@ class GeminiAnalyzer:
             logger.warning(f"JSON 解析失败: {e}，尝试从文本提取")
             return self._parse_text_response(response_text, code, name)
     
-    def _fix_json_string(self, json_str: str) -> str:
-        """修复常见的 JSON 格式问题"""
-        import re
-        
-        # 移除注释
-        json_str = re.sub(r'//.*?\n', '\n', json_str)
-        json_str = re.sub(r'/\*.*?\*/', '', json_str, flags=re.DOTALL)
+    def _result_from_data(self, data: Dict[str, Any], code: str, name: str) -> AnalysisResult:
+        """将解析出的 JSON 字典映射为 AnalysisResult"""
+        # 提取 dashboard 数据
+        dashboard = data.get('dashboard', None)
         
-        # 修复尾随逗号
-        json_str = re.sub(r',\s*}', '}', json_str)
-        json_str = re.sub(r',\s*]', ']', json_str)
-        
-        # 确保布尔值是小写
-        json_str = json_str.replace('True', 'true').replace('False', 'false')
+        # 解析所有字段，使用默认值防止缺失
+        return AnalysisResult(
+            code=code,
+            name=name,
+            # 核心指标
+            sentiment_score=int(data.get('sentiment_score', 50)),
+            trend_prediction=data.get('trend_prediction', '震荡'),
+            operation_advice=data.get('operation_advice', '持有'),
+            confidence_level=data.get('confidence_level', '中'),
+            # 决策仪表盘
+            dashboard=dashboard,
+            # 走势分析
+            trend_analysis=data.get('trend_analysis', ''),
+            short_term_outlook=data.get('short_term_outlook', ''),
+            medium_term_outlook=data.get('medium_term_outlook', ''),
+            # 技术面
+            technical_analysis=data.get('technical_analysis', ''),
+            ma_analysis=data.get('ma_analysis', ''),
+            volume_analysis=data.get('volume_analysis', ''),
+            pattern_analysis=data.get('pattern_analysis', ''),
+            # 基本面
+            fundamental_analysis=data.get('fundamental_analysis', ''),
+            sector_position=data.get('sector_position', ''),
+            company_highlights=data.get('company_highlights', ''),
+            # 情绪面/消息面
+            news_summary=data.get('news_summary', ''),
+            market_sentiment=data.get('market_sentiment', ''),
+            hot_topics=data.get('hot_topics', ''),
+            # 综合
+            analysis_summary=data.get('analysis_summary', '分析完成'),
+            key_points=data.get('key_points', ''),
+            risk_warning=data.get('risk_warning', ''),
+            buy_reason=data.get('buy_reason', ''),
+            # 元数据
+            search_performed=data.get('search_performed', False),
+            data_sources=data.get('data_sources', '技术面数据'),
+            success=True,
+        )
+    
+    def _parse_partial(self, text: str, code: str, name: str) -> Optional[AnalysisResult]:
+        """
+        对尚未接收完整的响应做部分解析（流式场景）
         
-        return json_str
+        依赖 jiter 的 partial_mode，未安装或当前内容无法解析时返回 None
+        """
+        if jiter is None:
+            return None
+        json_start = text.find('{')
+        if json_start < 0:
+            return None
+        try:
+            data = jiter.from_json(text[json_start:].encode('utf-8'), partial_mode='trailing-strings')
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        try:
+            return self._result_from_data(data, code, name)
+        except (TypeError, ValueError):
+            # 数值字段尚未接收完整
+            return None
+    
+    def _fix_json_string(self, json_str: str) -> str:
+        """修复常见的 JSON 格式问题"""
+        # 一次扫描完成：移除注释、修复尾随逗号、布尔值转小写
+        return _RE_FIXUP.sub(_fixup_replacement, json_str)
     
     def _parse_text_response(
         self, 
@@ -1207,12 +2338,10 @@ class GeminiAnalyzer:
         
         text_lower = response_text.lower()
         
-        # 简单的情绪识别
-        positive_keywords = ['看多', '买入', '上涨', '突破', '强势', '利好', '加仓', 'bullish', 'buy']
-        negative_keywords = ['看空', '卖出', '下跌', '跌破', '弱势', '利空', '减仓', 'bearish', 'sell']
-        
-        positive_count = sum(1 for kw in positive_keywords if kw in text_lower)
-        negative_count = sum(1 for kw in negative_keywords if kw in text_lower)
+        # 简单的情绪识别：一次扫描找出出现过的关键词，按正/负面分别计数（每个词只计一次）
+        found = {m.group(1) for m in _RE_SENTIMENT_KEYWORDS.finditer(text_lower)}
+        positive_count = len(found & _POSITIVE_KEYWORDS)
+        negative_count = len(found & _NEGATIVE_KEYWORDS)
         
         if positive_count > negative_count + 1:
             sentiment_score = 65
@@ -1243,31 +2372,150 @@ class GeminiAnalyzer:
     def batch_analyze(
         self, 
         contexts: List[Dict[str, Any]],
-        delay_between: float = 2.0
+        delay_between: float = 2.0,
+        news_fetcher: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None
     ) -> List[AnalysisResult]:
         """
-        批量分析多只股票
+        批量分析多只股票（同步接口）
         
-        注意：为避免 API 速率限制，每次分析之间会有延迟
+        注意：为避免 API 速率限制，请求发起速率不超过每 delay_between 秒一次；
+        与旧版串行实现不同，前一次请求未返回时下一次即可发起；
+        遇到 API 限流时自动降低发起速率，恢复后逐步回升
         
         Args:
             contexts: 上下文数据列表
-            delay_between: 每次分析之间的延迟（秒）
+            delay_between: 相邻两次请求发起的最小间隔（秒）
+            news_fetcher: 新闻获取函数，接收 context 返回新闻文本（可选）
             
         Returns:
             AnalysisResult 列表
         """
-        results = []
+        rps = 1.0 / delay_between if delay_between > 0 else None
+        return asyncio.run(
+            self.batch_analyze_async(contexts, rps=rps, news_fetcher=news_fetcher)
+        )
+    
+    @staticmethod
+    async def _prefetch_news(
+        contexts: List[Dict[str, Any]],
+        news_fetcher: Callable[[Dict[str, Any]], Optional[str]]
+    ) -> List[Optional[str]]:
+        """
+        并发预取所有股票的新闻
+        
+        news_fetcher 为同步函数（如 SearchService 的搜索调用），放入线程池并发执行；
+        单只股票获取失败时记录警告并返回 None，不影响其余股票
+        """
+        fetched = await asyncio.gather(
+            *(asyncio.to_thread(news_fetcher, ctx) for ctx in contexts),
+            return_exceptions=True
+        )
+        news_contexts = []
+        for ctx, news in zip(contexts, fetched):
+            if isinstance(news, Exception):
+                logger.warning(f"[{ctx.get('code', 'Unknown')}] 新闻预取失败: {news}")
+                news = None
+            news_contexts.append(news)
+        return news_contexts
+    
+    async def batch_analyze_async(
+        self,
+        contexts: List[Dict[str, Any]],
+        max_concurrency: Optional[int] = None,
+        rps: Optional[float] = None,
+        news_contexts: Optional[List[Optional[str]]] = None,
+        news_fetcher: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None
+    ) -> List[AnalysisResult]:
+        """
+        并发批量分析多只股票，带并发上限与令牌桶限速
+        
+        若未提供 news_contexts 但提供了 news_fetcher，会先并发预取全部新闻，
+        再发起 LLM 请求，避免每只股票串行等待搜索
+        
+        Args:
+            contexts: 上下文数据列表
+            max_concurrency: 最大并发请求数（默认取 MAX_CONCURRENT_LLM）
+            rps: 每秒最多发起的请求数（None 表示不限速；遇到限流时自适应下调）
+            news_contexts: 与 contexts 一一对应的新闻内容列表（可选）
+            news_fetcher: 新闻获取函数，接收 context 返回新闻文本（可选）
+            
+        Returns:
+            AnalysisResult 列表（顺序与 contexts 一致）
+        """
+        if not contexts:
+            return []
+        
+        if news_contexts is None:
+            if news_fetcher is not None:
+                news_contexts = await self._prefetch_news(contexts, news_fetcher)
+            else:
+                news_contexts = [None] * len(contexts)
+        
+        if max_concurrency is None:
+            max_concurrency = self._config.max_concurrent_llm
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        limiter = _AsyncTokenBucket(rps) if rps else None
+        
+        results = await asyncio.gather(
+            *(self._bounded(semaphore, ctx, news, limiter) for ctx, news in zip(contexts, news_contexts))
+        )
+        return list(results)
+    
+    async def analyze_async(
+        self, 
+        context: Dict[str, Any],
+        news_context: Optional[str] = None
+    ) -> AnalysisResult:
+        """
+        异步分析单只股票
         
-        for i, context in enumerate(contexts):
-            if i > 0:
-                logger.debug(f"等待 {delay_between} 秒后继续...")
-                time.sleep(delay_between)
+        SDK 调用本身是同步阻塞的，这里将 analyze() 放到线程中执行，
+        避免阻塞事件循环，从而允许多只股票的 LLM 请求并发等待
+        
+        Args:
+            context: 上下文数据
+            news_context: 预先搜索的新闻内容（可选）
             
-            result = self.analyze(context)
-            results.append(result)
+        Returns:
+            AnalysisResult 对象
+        """
+        return await asyncio.to_thread(self.analyze, context, news_context)
+    
+    async def _bounded(
+        self,
+        semaphore: asyncio.Semaphore,
+        context: Dict[str, Any],
+        news_context: Optional[str] = None,
+        limiter: Optional[_AsyncTokenBucket] = None
+    ) -> AnalysisResult:
+        """在信号量（及可选的令牌桶）限制下执行单次分析，并将限流情况反馈给令牌桶"""
+        async with semaphore:
+            if limiter is None:
+                return await self.analyze_async(context, news_context)
+            await limiter.acquire()
+            result = await self.analyze_async(context, news_context)
+            limiter.feedback(self._rate_limit_hits)
+            return result
+    
+    async def analyze_many(
+        self,
+        contexts: List[Dict[str, Any]],
+        news_contexts: Optional[List[Optional[str]]] = None
+    ) -> List[AnalysisResult]:
+        """
+        并发分析多只股票
         
-        return results
+        LLM 调用是纯 I/O 等待，N 只股票的总耗时从 N×延迟
+        降为约 ceil(N/并发数)×延迟；并发数由 MAX_CONCURRENT_LLM 控制
+        
+        Args:
+            contexts: 上下文数据列表
+            news_contexts: 与 contexts 一一对应的新闻内容列表（可选）
+            
+        Returns:
+            AnalysisResult 列表（顺序与 contexts 一致）
+        """
+        return await self.batch_analyze_async(contexts, news_contexts=news_contexts)
 
 
 # 便捷函数
@@ -1,12 +1,87 @@
 ﻿import logging
-from typing import Optional, Dict, Any, Tuple
-from dataclasses import dataclass
+from collections import namedtuple
+from typing import Optional, Dict, Any, Tuple, List, Mapping, Union
+from dataclasses import dataclass, fields
 import pandas as pd
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+__all__ = [
+    'BuyPointAnalyzer',
+    'BuyPointResult',
+    'BuyPointResultTuple',
+]
+
+# analyze() 需要读取最新值的指标列（缺失时使用默认值）
+_LATEST_COLUMNS = ('ma5', 'ma10', 'ma20', 'ma120', 'volume_ratio')
+
+# analyze() 读取的全部输入列
+_INPUT_COLUMNS = ('close', 'high', 'low') + _LATEST_COLUMNS
+
+# 支撑位计算使用的黄金分割比例（自高点回撤）
+_FIB_RATIOS = (0.382, 0.500, 0.618)
+
+_MA120_STATUSES = ("价格小于MA120", "价格≈MA120", "价格大于MA120")
+
+# (短期信号, MA120状态) → (标签, 标签文字)；未命中的组合按"观望"处理
+_LABEL_TABLE = {
+    **{("破位", status): ("🔴", "规避") for status in _MA120_STATUSES},
+    **{("乖离过大", status): ("🟡", "观望") for status in _MA120_STATUSES},
+    **{
+        (signal, status): ("⭐", "最佳买点") if status == "价格小于MA120" else ("🟢", "良好买点")
+        for signal in ("缩量回踩", "放量突破")
+        for status in _MA120_STATUSES
+    },
+}
+
+# (标签, 是否缩量回踩) → 建议模板（{add_price} 为加仓位）；🟡 观望按 MA120 状态单独处理
+_ADVICE_TABLE = {
+    ("⭐", True): "可分批建仓，回踩{add_price}元附近可加仓",
+    ("⭐", False): "可适量建仓，注意控制仓位",
+    ("🟢", True): "可小仓试探，等待回踩{add_price}元加仓",
+    ("🟢", False): "可关注，突破后轻仓跟进",
+    ("🔴", True): "建议暂时规避，等待企稳信号",
+    ("🔴", False): "建议暂时规避，等待企稳信号",
+}
+
+
+# to_report_section() 的固定模板：一次 format 后按行拆分
+_REPORT_HEADER = "#### 📊 技术面买点分析"
+_REPORT_TEMPLATE = (
+    _REPORT_HEADER + "\n"
+    "\n"
+    "**{label} {label_text}**\n"
+    "\n"
+    "├─ 短期信号：{short_signal} ({short_signal_detail})\n"
+    "├─ MA120状态：{ma120_status} ({ma120_deviation:+.1f}%)\n"
+    "└─ 量比：{volume_ratio}\n"
+    "\n"
+    "📌 **建议**：{current_advice}\n"
+)
+
+
+def _tail_max(arr: np.ndarray, n: int) -> float:
+    """最近 n 个值的最大值（忽略 NaN，与 pandas tail(n).max() 一致）"""
+    return np.fmax.reduce(arr[-n:])
+
+
+def _tail_min(arr: np.ndarray, n: int) -> float:
+    """最近 n 个值的最小值（忽略 NaN，与 pandas tail(n).min() 一致）"""
+    return np.fmin.reduce(arr[-n:])
+
+
+def _tail_mean(arr: np.ndarray, n: int) -> float:
+    """最近 n 个值的均值（忽略 NaN，与 pandas tail(n).mean() 一致）"""
+    window = arr[-n:]
+    mask = np.isnan(window)
+    if not mask.any():
+        return window.mean()
+    count = window.size - int(mask.sum())
+    return np.where(mask, 0.0, window).sum() / count if count else np.nan
+
+
+@dataclass(slots=True)
 class BuyPointResult:
     """买点分析结果"""
     # 买点标签: ⭐最佳买点 / 🟢良好买点 / 🟡观望 / 🔴规避
@@ -38,6 +113,16 @@ class BuyPointResult:
     take_profit_price: Optional[float] = None # 止盈位
     stop_loss_price: Optional[float] = None # 止损位
 
+
+# analyze(fast=True) 返回的轻量结果：字段与 BuyPointResult 一致，构造开销更低，
+# 适合批量筛选只读取 label 等少数字段的场景；同样支持按属性访问，可直接用于 to_report_section()
+BuyPointResultTuple = namedtuple(
+    'BuyPointResultTuple',
+    [f.name for f in fields(BuyPointResult)],
+    defaults=(None, "", None, None),
+)
+
+
 class BuyPointAnalyzer:
     """复合买点分析器"""
     
@@ -46,29 +131,48 @@ class BuyPointAnalyzer:
     
     def analyze(
         self, 
-        df: pd.DataFrame, 
-        realtime_quote: Optional[Dict[str, Any]] = None
-    ) -> Optional[BuyPointResult]:
+        df: Union[pd.DataFrame, Mapping[str, np.ndarray]], 
+        realtime_quote: Optional[Dict[str, Any]] = None,
+        fast: bool = False
+    ) -> Optional[Union[BuyPointResult, BuyPointResultTuple]]:
         """
         分析买点
         
         Args:
-            df: 历史K线数据 (需包含 close, ma5, ma10, ma20, ma120, volume_ratio)
+            df: 历史K线数据 (需包含 close, ma5, ma10, ma20, ma120, volume_ratio)；
+                批量分析时也可直接传入 {列名: numpy 数组}，跳过 DataFrame 的构造与索引开销
             realtime_quote: 实时行情 (可选)
+            fast: 为 True 时返回 BuyPointResultTuple（批量筛选用），否则返回 BuyPointResult
             
         Returns:
-            BuyPointResult 或 None
+            BuyPointResult / BuyPointResultTuple 或 None
         """
-        if df is None or df.empty or len(df) < 5:
+        if df is None:
+            return None
+        
+        if isinstance(df, pd.DataFrame):
+            if df.empty:
+                return None
+            columns = df.columns
+            data = {col: df[col].to_numpy() for col in _INPUT_COLUMNS if col in columns}
+            n_rows = len(df)
+        else:
+            data = {col: np.asarray(df[col]) for col in _INPUT_COLUMNS if col in df}
+            n_rows = len(data['close']) if 'close' in data else 0
+        
+        if n_rows < 5:
             return None
             
         try:
-            # 获取最新数据 (使用最后一行)
-            latest = df.iloc[-1]
-            prev = df.iloc[-2]
+            # 价格序列只转换一次，后续窗口统计直接在 numpy 数组上切片计算
+            arrs = {col: data[col] for col in ('high', 'low') if col in data}
+            arrs['close'] = data['close'].astype(np.float64, copy=False)
+            
+            # 获取最新数据（按列取最后一个值，避免 iloc[-1] 构造整行 Series）
+            latest = {col: data[col][-1] for col in _LATEST_COLUMNS if col in data}
             
             # 基础数据
-            current_price = float(latest['close'])
+            current_price = float(arrs['close'][-1])
             if realtime_quote and realtime_quote.get('price', 0) > 0:
                 current_price = float(realtime_quote['price'])
                 
@@ -80,13 +184,9 @@ class BuyPointAnalyzer:
             volume_ratio = float(latest.get('volume_ratio', 1.0))
             
             # 如果数据库中没有 ma120，尝试从历史数据动态计算
-            if ma120 <= 0 and len(df) >= 20:
-                # 计算 MA120
-                close_series = df['close'].astype(float)
-                if len(close_series) >= 120:
-                    ma120 = close_series.tail(120).mean()
-                else:
-                    ma120 = close_series.mean()
+            if ma120 <= 0 and n_rows >= 20:
+                # 计算 MA120（不足 120 日时取全部数据）
+                ma120 = _tail_mean(arrs['close'], 120)
                 logger.debug(f"动态计算 MA120 = {ma120:.2f}")
             
             if ma120 <= 0:
@@ -104,7 +204,7 @@ class BuyPointAnalyzer:
             
             # 2. 判断短期信号
             short_signal, short_signal_detail = self._analyze_short_signal(
-                current_price, ma5, ma10, ma20, volume_ratio, df
+                current_price, ma5, ma10, ma20, volume_ratio, arrs
             )
             
             # 3. 综合判定标签
@@ -114,15 +214,16 @@ class BuyPointAnalyzer:
             ma_dict = {
                 'MA5': ma5, 'MA10': ma10, 'MA20': ma20, 'MA120': ma120
             }
-            add_price, add_price_desc = self._calculate_support_price(df, current_price, ma_dict)
+            add_price, add_price_desc = self._calculate_support_price(arrs, current_price, ma_dict)
             
-            take_profit_price = self._calculate_take_profit(df, current_price)
+            take_profit_price = self._calculate_take_profit(arrs, current_price)
             stop_loss_price = round(ma20 * 0.98, 2) if ma20 > 0 else None  # MA20 下方 2%
             
             # 5. 生成当前建议
             current_advice = self._generate_advice(label, short_signal, ma120_status, current_price, add_price)
             
-            return BuyPointResult(
+            result_cls = BuyPointResultTuple if fast else BuyPointResult
+            return result_cls(
                 label=label,
                 label_text=label_text,
                 short_signal=short_signal,
@@ -142,10 +243,62 @@ class BuyPointAnalyzer:
                 volume_ratio=round(volume_ratio, 2)
             )
         
-        except Exception as e:
+        except (KeyError, TypeError, ValueError) as e:
+            # 缺列或指标值无法转换为数值（如 None/字符串）时放弃分析
             logger.error(f"买点分析失败: {e}")
             return None
 
+    def analyze_many(
+        self,
+        close: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        ma: Mapping[str, np.ndarray],
+        volume_ratio: Optional[np.ndarray] = None,
+        realtime_prices: Optional[np.ndarray] = None,
+        fast: bool = False,
+    ) -> List[Optional[Union[BuyPointResult, BuyPointResultTuple]]]:
+        """
+        批量分析买点（选股扫描场景）
+        
+        各股票按交易日对齐为二维矩阵，逐行切片后以 {列名: 数组} 形式复用 analyze()，
+        判定规则与单只分析完全一致，只省去每只股票构造 DataFrame 的开销。
+        
+        Args:
+            close/high/low: 形状 (n_stocks, n_days) 的价格矩阵
+            ma: {'ma5'/'ma10'/'ma20'/'ma120': 数组}，可为 (n_stocks, n_days) 矩阵
+                或 (n_stocks,) 最新值向量；缺失的均线按 analyze() 的默认值处理
+            volume_ratio: (n_stocks,) 最新量比向量 (可选)
+            realtime_prices: (n_stocks,) 实时价格向量 (可选，<=0 或 NaN 时使用收盘价)
+            fast: 透传给 analyze()，为 True 时返回 BuyPointResultTuple
+            
+        Returns:
+            与输入行顺序一致的结果列表（无法分析的股票为 None）
+        """
+        close = np.asarray(close)
+        high = np.asarray(high)
+        low = np.asarray(low)
+        if close.ndim != 2 or high.shape != close.shape or low.shape != close.shape:
+            raise ValueError("close/high/low 必须是形状相同的二维矩阵 (n_stocks, n_days)")
+        
+        # 最新值向量切成长度为 1 的视图，analyze() 只读取末尾值
+        columns = {col: np.asarray(arr) for col, arr in ma.items() if col in _LATEST_COLUMNS}
+        if volume_ratio is not None:
+            columns['volume_ratio'] = np.asarray(volume_ratio)
+        
+        results = []
+        for i in range(close.shape[0]):
+            data = {'close': close[i], 'high': high[i], 'low': low[i]}
+            for col, arr in columns.items():
+                data[col] = arr[i] if arr.ndim == 2 else arr[i:i + 1]
+            
+            quote = None
+            if realtime_prices is not None and realtime_prices[i] > 0:
+                quote = {'price': float(realtime_prices[i])}
+            
+            results.append(self.analyze(data, quote, fast=fast))
+        return results
+
     def _analyze_short_signal(
         self, 
         price: float, 
@@ -153,7 +306,7 @@ class BuyPointAnalyzer:
         ma10: float, 
         ma20: float, 
         volume_ratio: float,
-        df: pd.DataFrame
+        arrs: Dict[str, np.ndarray]
     ) -> Tuple[str, str]:
         """分析短期信号"""
         
@@ -162,7 +315,7 @@ class BuyPointAnalyzer:
         bias_ma10 = ((price - ma10) / ma10) * 100 if ma10 > 0 else 0
         
         # 判断均线排列
-        is_bullish = ma5 > ma10 > ma20 if all([ma5, ma10, ma20]) else False
+        is_bullish = ma5 > ma10 > ma20 > 0
         
         # 缩量回踩型（优先）
         if volume_ratio < 0.8 and abs(bias_ma10) < 3 and is_bullish:
@@ -174,7 +327,7 @@ class BuyPointAnalyzer:
         # 放量突破型
         if volume_ratio > 1.5 and bias_ma5 > 0 and bias_ma5 < 5:
             # 检查是否突破前高
-            recent_high = df['high'].tail(20).max() if len(df) >= 20 else df['high'].max()
+            recent_high = _tail_max(arrs['high'], 20)
             if price >= recent_high * 0.98:
                 return "放量突破", f"量比{volume_ratio:.2f}, 突破近期高点"
             else:
@@ -193,23 +346,10 @@ class BuyPointAnalyzer:
     def _determine_label(self, short_signal: str, ma120_status: str, ma120_deviation: float) -> Tuple[str, str]:
         """综合判定标签"""
         
-        # 破位 → 规避
-        if short_signal == "破位":
-            return "🔴", "规避"
-        
-        # 乖离过大 → 观望
-        if short_signal == "乖离过大":
-            return "🟡", "观望"
-        
-        # 有短期信号
-        if short_signal in ["缩量回踩", "放量突破"]:
-            # MA120 加分
-            if ma120_status == "价格小于MA120":
-                return "⭐", "最佳买点"
-            elif ma120_status == "价格≈MA120":
-                return "🟢", "良好买点"
-            else:
-                return "🟢", "良好买点"
+        # 破位 → 规避；乖离过大 → 观望；缩量回踩/放量突破 → 按 MA120 状态定级
+        label = _LABEL_TABLE.get((short_signal, ma120_status))
+        if label is not None:
+            return label
         
         # 无信号但在 MA120 以下
         if ma120_status == "价格小于MA120" and ma120_deviation < -5:
@@ -220,7 +360,7 @@ class BuyPointAnalyzer:
     
     def _calculate_support_price(
         self, 
-        df: pd.DataFrame, 
+        arrs: Dict[str, np.ndarray], 
         current_price: float, 
         ma_dict: dict
     ) -> Tuple[Optional[float], str]:
@@ -228,99 +368,84 @@ class BuyPointAnalyzer:
         计算支撑位（加仓点）
         策略：黄金分割 + 均线共振
         """
-        try:
-            if len(df) < 60:
-                # 数据不足，仅使用均线
-                candidates = []
-                for name, val in ma_dict.items():
-                    if 0 < val < current_price:
-                        candidates.append((val, f"{name}支撑"))
-                
-                if candidates:
-                    # 返回最大的那个（最近的支撑）
-                    best = max(candidates, key=lambda x: x[0])
-                    return round(best[0], 2), best[1]
-                return None, ""
-            
-            # 1. 计算黄金分割位 (近60日)
-            recent_high = df['high'].tail(60).max()
-            recent_low = df['low'].tail(60).min()
-            price_range = recent_high - recent_low
-            
-            fib_levels = {
-                0.382: recent_high - price_range * 0.382,
-                0.500: recent_high - price_range * 0.500,
-                0.618: recent_high - price_range * 0.618
-            }
-            
-            # 2. 寻找共振（黄金分割 ±1.5% 范围内有均线）
-            resonance_supports = []
-            
-            for ratio, fib_price in fib_levels.items():
-                if fib_price >= current_price: continue  # 只找下方的
-                
-                # 检查是否有均线在此位置附近
-                matched_mas = []
-                for ma_name, ma_val in ma_dict.items():
-                    if abs(ma_val - fib_price) / fib_price < 0.015:  # 1.5% 误差内
-                        matched_mas.append(ma_name)
-                
-                if matched_mas:
-                    desc = f"黄金分割{ratio:.3f} + {'/'.join(matched_mas)}共振"
-                    resonance_supports.append((fib_price, desc))
-                else:
-                    # 单纯黄金分割支撑（权重较低）
-                    desc = f"黄金分割{ratio:.3f}支撑"
-                    resonance_supports.append((fib_price, desc))
+        if len(arrs['close']) < 60:
+            # 数据不足，仅使用均线
+            candidates = []
+            for name, val in ma_dict.items():
+                if 0 < val < current_price:
+                    candidates.append((val, f"{name}支撑"))
             
-            # 3. 加入单纯均线支撑（作为补充）
-            for ma_name, ma_val in ma_dict.items():
-                if 0 < ma_val < current_price:
-                    # 避免与黄金分割重复（如果已经在共振里了，就不加了）
-                    is_duplicate = False
-                    for res_p, _ in resonance_supports:
-                        if abs(res_p - ma_val) / ma_val < 0.015:
-                            is_duplicate = True
-                            break
-                    if not is_duplicate:
-                        resonance_supports.append((ma_val, f"{ma_name}支撑"))
-            
-            if not resonance_supports:
-                return None, ""
-            
-            # 4. 选择最优支撑
-            # 优先选共振，其次选最近的
-            # 这里简化逻辑：直接选下方最近的一个强支撑
-            
-            # 过滤掉太近的（比如只差 0.5%），除非是暴跌后的反弹
-            valid_supports = [s for s in resonance_supports if s[0] < current_price * 0.995]
-            
-            if not valid_supports:
-                # 如果都很近，或者没有下方的，返回空
-                return None, ""
-            
-            # 按价格从高到低排序（离现价最近的）
-            valid_supports.sort(key=lambda x: x[0], reverse=True)
-            
-            # 返回最近的一个
-            best_support = valid_supports[0]
-            return round(best_support[0], 2), best_support[1]
+            if candidates:
+                # 返回最大的那个（最近的支撑）
+                best = max(candidates, key=lambda x: x[0])
+                return round(best[0], 2), best[1]
+            return None, ""
+        
+        if 'high' not in arrs or 'low' not in arrs:
+            return None, ""
+        
+        # 1. 计算黄金分割位 (近60日)
+        recent_high = _tail_max(arrs['high'], 60)
+        recent_low = _tail_min(arrs['low'], 60)
+        price_range = recent_high - recent_low
+        
+        ma_items = tuple(ma_dict.items())
+        
+        # 2. 寻找共振（黄金分割 ±1.5% 范围内有均线）
+        # 候选支撑只记录 (价格, 黄金分割比例, 均线名)，描述文字仅为最终选中的支撑生成
+        supports = []
+        
+        for ratio in _FIB_RATIOS:
+            fib_price = recent_high - price_range * ratio
+            if fib_price >= current_price: continue  # 只找下方的
             
-        except Exception as e:
-            logger.warning(f"计算支撑位失败: {e}")
+            # 检查是否有均线在此位置附近（1.5% 误差内）
+            matched_mas = tuple(
+                ma_name for ma_name, ma_val in ma_items
+                if abs(ma_val - fib_price) / fib_price < 0.015
+            )
+            supports.append((fib_price, ratio, matched_mas))
+        
+        # 3. 加入单纯均线支撑（作为补充）
+        for ma_name, ma_val in ma_items:
+            if 0 < ma_val < current_price:
+                # 避免与黄金分割重复（如果已经在共振里了，就不加了）
+                is_duplicate = any(abs(res_p - ma_val) / ma_val < 0.015 for res_p, _, _ in supports)
+                if not is_duplicate:
+                    supports.append((ma_val, None, (ma_name,)))
+        
+        # 4. 选择最优支撑
+        # 优先选共振，其次选最近的
+        # 这里简化逻辑：直接选下方最近的一个强支撑
+        # 过滤掉太近的（比如只差 0.5%），除非是暴跌后的反弹；价格相同时取先加入的
+        threshold = current_price * 0.995
+        best_support = None
+        for support in supports:
+            if support[0] < threshold and (best_support is None or support[0] > best_support[0]):
+                best_support = support
+        
+        if best_support is None:
+            # 如果都很近，或者没有下方的，返回空
             return None, ""
+        
+        price, ratio, matched_mas = best_support
+        if ratio is None:
+            desc = f"{matched_mas[0]}支撑"
+        elif matched_mas:
+            desc = f"黄金分割{ratio:.3f} + {'/'.join(matched_mas)}共振"
+        else:
+            # 单纯黄金分割支撑（权重较低）
+            desc = f"黄金分割{ratio:.3f}支撑"
+        return round(price, 2), desc
 
-    def _calculate_take_profit(self, df: pd.DataFrame, current_price: float) -> Optional[float]:
+    def _calculate_take_profit(self, arrs: Dict[str, np.ndarray], current_price: float) -> Optional[float]:
         """计算止盈位（前高压力）"""
-        try:
-            if len(df) < 20:
-                return None
-            recent_high = df['high'].tail(60).max()
-            if recent_high > current_price * 1.03:  # 至少有3%空间
-                return round(recent_high, 2)
-            return None
-        except:
+        if len(arrs['close']) < 20 or 'high' not in arrs:
             return None
+        recent_high = _tail_max(arrs['high'], 60)
+        if recent_high > current_price * 1.03:  # 至少有3%空间
+            return round(recent_high, 2)
+        return None
     
     def _generate_advice(
         self, 
@@ -332,43 +457,28 @@ class BuyPointAnalyzer:
     ) -> str:
         """生成当前建议"""
         
-        if label == "⭐":
-            if short_signal == "缩量回踩":
-                return f"可分批建仓，回踩{add_price}元附近可加仓"
-            else:
-                return "可适量建仓，注意控制仓位"
-        
-        elif label == "🟢":
-            if short_signal == "缩量回踩":
-                return f"可小仓试探，等待回踩{add_price}元加仓"
-            else:
-                return "可关注，突破后轻仓跟进"
+        template = _ADVICE_TABLE.get((label, short_signal == "缩量回踩"))
+        if template is not None:
+            return template.format(add_price=add_price)
         
-        elif label == "🔴":
-            return "建议暂时规避，等待企稳信号"
-        
-        else:  # 🟡
-            if ma120_status == "价格小于MA120":
-                return "处于价值区，可等待短期买点信号"
-            else:
-                return "暂无明确信号，继续观察"
+        # 🟡
+        if ma120_status == "价格小于MA120":
+            return "处于价值区，可等待短期买点信号"
+        return "暂无明确信号，继续观察"
     
     def to_report_section(self, result: BuyPointResult) -> list:
         """生成报告板块内容"""
-        lines = [
-            "#### 📊 技术面买点分析",
-            "",
-            f"**{result.label} {result.label_text}**",
-            "",
-            f"├─ 短期信号：{result.short_signal} ({result.short_signal_detail})",
-            f"├─ MA120状态：{result.ma120_status} ({result.ma120_deviation:+.1f}%)",
-            f"└─ 量比：{result.volume_ratio}",
-            "",
-        ]
-        
-        # 当前建议
-        lines.append(f"📌 **建议**：{result.current_advice}")
-        lines.append("")
+        # 标题、标签、信号与建议：一次 format 后按行拆分（末尾换行产生空行）
+        lines = _REPORT_TEMPLATE.format(
+            label=result.label,
+            label_text=result.label_text,
+            short_signal=result.short_signal,
+            short_signal_detail=result.short_signal_detail,
+            ma120_status=result.ma120_status,
+            ma120_deviation=result.ma120_deviation,
+            volume_ratio=result.volume_ratio,
+            current_advice=result.current_advice,
+        ).split("\n")
         
         # 关键价位
         key_prices = []
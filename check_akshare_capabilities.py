@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import akshare as ak
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
@@ -47,10 +48,11 @@ def check_history_valuation(code):
             logger.warning("无近10年数据")
             df_10y = df_pe
             
-        current_pe = df_10y[val_col].iloc[-1]
+        values = df_10y[val_col].to_numpy(dtype=float)
+        current_pe = values[-1]
         
         # 计算分位
-        pe_rank = (df_10y[val_col] < current_pe).mean() * 100
+        pe_rank = np.count_nonzero(values < current_pe) / values.size * 100
         
         logger.info(f"历史数据(PE-TTM)获取成功! (条数: {len(df_10y)})")
         logger.info(f"   当前 PE(TTM): {current_pe:.2f} (10年分位: {pe_rank:.1f}%)")
@@ -83,26 +85,19 @@ def check_peer_comparison(code):
             return False
         
         # 3. 寻找总市值列 (Fuzzy Match)
-        mv_col = None
-        for col in peers_df.columns:
-            if '市值' in col and '总' in col:
-                mv_col = col
-                break
+        cols = peers_df.columns
+        mv_cols = cols[cols.str.contains('市值', regex=False, na=False)]
+        total_mv_cols = mv_cols[mv_cols.str.contains('总', regex=False, na=False)]
+        # 优先总市值列，Fallback: 第一个包含 '市值' 的列
+        mv_col = next(iter(total_mv_cols), mv_cols[0] if len(mv_cols) else None)
         
-        if not mv_col:
-            # Fallback: try just '市值'
-            for col in peers_df.columns:
-                if '市值' in col:
-                    mv_col = col
-                    break
-        
-        if not mv_col:
+        if mv_col is None:
             logger.error(f"无法找到市值列, 现有列名: {peers_df.columns.tolist()}")
             return False
             
-        # 排序
-        peers_df.sort_values(by=mv_col, ascending=False, inplace=True)
-        top_peers = peers_df.head(5)
+        # 取市值前 5（转为数值后用堆选取，无需整表排序）
+        peers_df[mv_col] = pd.to_numeric(peers_df[mv_col], errors='coerce')
+        top_peers = peers_df.nlargest(5, mv_col)
         
         logger.info(f"获取同业成功! {industry} 行业共 {len(peers_df)} 只股票")
         logger.info(f"   行业龙头示例: {top_peers['名称'].tolist()}")
@@ -48,6 +48,8 @@ class Config:
     gemini_request_delay: float = 2.0  # 请求间隔（秒）
     gemini_max_retries: int = 5  # 最大重试次数
     gemini_retry_delay: float = 5.0  # 重试基础延时（秒）
+    max_concurrent_llm: int = 3  # 批量分析时 LLM 最大并发请求数
+    gemini_context_cache_ttl: int = 3600  # 系统提示词上下文缓存 TTL（秒），0 表示禁用
     
     # OpenAI 兼容 API（备选，当 Gemini 不可用时使用）
     openai_api_key: Optional[str] = None
@@ -95,6 +97,10 @@ class Config:
     # === 数据库配置 ===
     database_path: str = "./data/stock_analysis.db"
     
+    # === AI 分析结果缓存 ===
+    analysis_cache_ttl: int = 14400  # 相同 Prompt 的分析结果缓存时间（秒），0 表示禁用
+    analysis_cache_path: str = "./data/analysis_cache.db"  # 持久化缓存文件，留空则仅使用内存缓存
+    
     # === 日志配置 ===
     log_dir: str = "./logs"  # 日志文件目录
     log_level: str = "INFO"  # 日志级别
@@ -210,6 +216,8 @@ class Config:
             gemini_request_delay=float(os.getenv('GEMINI_REQUEST_DELAY', '2.0')),
             gemini_max_retries=int(os.getenv('GEMINI_MAX_RETRIES', '5')),
             gemini_retry_delay=float(os.getenv('GEMINI_RETRY_DELAY', '5.0')),
+            max_concurrent_llm=int(os.getenv('MAX_CONCURRENT_LLM', '3')),
+            gemini_context_cache_ttl=int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', '3600')),
             openai_api_key=os.getenv('OPENAI_API_KEY'),
             openai_base_url=os.getenv('OPENAI_BASE_URL'),
             openai_model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
@@ -231,6 +239,8 @@ class Config:
             feishu_max_bytes=int(os.getenv('FEISHU_MAX_BYTES', '20000')),
             wechat_max_bytes=int(os.getenv('WECHAT_MAX_BYTES', '4000')),
             database_path=os.getenv('DATABASE_PATH', './data/stock_analysis.db'),
+            analysis_cache_ttl=int(os.getenv('ANALYSIS_CACHE_TTL', '14400')),
+            analysis_cache_path=os.getenv('ANALYSIS_CACHE_PATH', './data/analysis_cache.db'),
             log_dir=os.getenv('LOG_DIR', './logs'),
             log_level=os.getenv('LOG_LEVEL', 'INFO'),
             max_workers=int(os.getenv('MAX_WORKERS', '3')),
@@ -14,9 +14,15 @@ Dang氏投资筛选器 - 价值投资核心配置
 5. 补仓逻辑 - 跌10%以上才考虑补仓
 """
 
+import functools
+import re
+from bisect import bisect_left
 from typing import Dict, List, Tuple, Optional
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+import pandas as pd
 
 
 class IndustryTier(Enum):
@@ -74,6 +80,129 @@ CAUTION_INDUSTRIES = [
 ]
 
 
+# ========================================
+# 股票类型关键词（按 银行 > 周期 > 科技 > 消费 的优先级判定）
+# ========================================
+
+BANKING_KEYWORDS = ["银行"]
+CYCLICAL_KEYWORDS = ["有色", "煤炭", "钢铁", "石油", "化工", "矿", "水泥", "航运"]
+TECH_KEYWORDS = ["科技", "软件", "互联网", "半导体", "芯片", "AI", "人工智能", "云计算"]
+CONSUMER_KEYWORDS = ["白酒", "食品", "饮料", "家电", "服装", "零售", "消费"]
+
+# 优先级从高到低排列，末尾为未命中任何关键词时的结果
+_TIER_BY_RANK: Tuple[IndustryTier, ...] = (
+    IndustryTier.BLACKLIST, IndustryTier.PREFERRED, IndustryTier.CAUTION, IndustryTier.NORMAL,
+)
+_TYPE_BY_RANK: Tuple[StockType, ...] = (
+    StockType.BANKING, StockType.CYCLICAL, StockType.TECH, StockType.CONSUMER, StockType.DEFAULT,
+)
+
+
+def _trie_alternation(keywords: List[str]) -> str:
+    """把关键词编译为前缀树形式的正则交替式：公共前缀只比较一次，同一位置优先匹配较长的关键词"""
+    trie: Dict[str, dict] = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # 关键词结束标记
+    
+    def build(node: Dict[str, dict]) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in node.items() if ch]
+        if not alts:
+            return ""
+        body = "(?:" + "|".join(alts) + ")"
+        return body + "?" if "" in node else body
+    
+    return build(trie)
+
+
+def _build_keyword_scanner() -> Tuple[re.Pattern, Dict[str, Tuple[int, int]]]:
+    """
+    把行业等级与股票类型的全部关键词编译为一个多模式匹配器
+    
+    正则在每个位置用零宽前瞻匹配，命中的是从该处开始的最长关键词；同一位置上更短的
+    关键词都是它的前缀，预先并入它的标签。这样一次 findall 就能得到字符串中所有关键词
+    的命中情况（与逐个 `in` 检查等价）。
+    
+    Returns:
+        (正则, {关键词: (行业等级优先级, 股票类型优先级)})，优先级数值越小越优先
+    """
+    tier_lists = (BLACKLIST_INDUSTRIES, PREFERRED_INDUSTRIES, CAUTION_INDUSTRIES)
+    type_lists = (BANKING_KEYWORDS, CYCLICAL_KEYWORDS, TECH_KEYWORDS, CONSUMER_KEYWORDS)
+    no_tier, no_type = len(tier_lists), len(type_lists)
+    
+    own_tier: Dict[str, int] = {}
+    own_type: Dict[str, int] = {}
+    for rank, keywords in enumerate(tier_lists):
+        for kw in keywords:
+            own_tier.setdefault(kw, rank)
+    for rank, keywords in enumerate(type_lists):
+        for kw in keywords:
+            own_type.setdefault(kw, rank)
+    
+    keywords = list(dict.fromkeys((*own_tier, *own_type)))
+    tags = {}
+    for kw in keywords:
+        prefixes = [p for p in keywords if kw.startswith(p)]
+        tags[kw] = (
+            min(own_tier.get(p, no_tier) for p in prefixes),
+            min(own_type.get(p, no_type) for p in prefixes),
+        )
+    
+    pattern = re.compile("(?=(" + _trie_alternation(keywords) + "))")
+    return pattern, tags
+
+
+_KEYWORD_PATTERN, _KEYWORD_TAGS = _build_keyword_scanner()
+
+
+def _scan_keywords(industry: str) -> Tuple[int, int]:
+    """一次扫描行业名，返回 (行业等级优先级, 股票类型优先级)，分别作为 _TIER_BY_RANK / _TYPE_BY_RANK 的下标"""
+    tier_rank = len(_TIER_BY_RANK) - 1
+    type_rank = len(_TYPE_BY_RANK) - 1
+    for kw in _KEYWORD_PATTERN.findall(industry):
+        kw_tier, kw_type = _KEYWORD_TAGS[kw]
+        if kw_tier < tier_rank:
+            tier_rank = kw_tier
+        if kw_type < type_rank:
+            type_rank = kw_type
+    return tier_rank, type_rank
+
+
+# 行业名恰好等于某个关键词时直接查表（预先用同一扫描器算好，结果与扫描一致）
+_EXACT_KEYWORD_RANKS: Dict[str, Tuple[int, int]] = {kw: _scan_keywords(kw) for kw in _KEYWORD_TAGS}
+
+
+def _keyword_ranks(industry: str) -> Tuple[int, int]:
+    """行业名的 (行业等级优先级, 股票类型优先级)：精确命中关键词时查表，否则扫描"""
+    ranks = _EXACT_KEYWORD_RANKS.get(industry)
+    if ranks is None:
+        ranks = _scan_keywords(industry)
+    return ranks
+
+_INDUSTRY_COMMENTS = {
+    IndustryTier.BLACKLIST: "⚠️ {industry}属于Dang氏黑名单行业，内卷严重或商业模式差",
+    IndustryTier.PREFERRED: "✅ {industry}是Dang氏优选的生产资料类行业",
+    IndustryTier.CAUTION: "⚡ {industry}需要额外关注政策和估值风险",
+    IndustryTier.NORMAL: "{industry}属于普通行业",
+}
+
+
+def _classify_industry_and_type(industry: str) -> Tuple[IndustryTier, str, StockType]:
+    """
+    一次扫描同时得到 (行业等级, 行业点评, 股票类型)
+    
+    结果与分别调用 DangFilter.classify_industry / classify_stock_type 一致，
+    但两者共用同一次关键词扫描。
+    """
+    if not industry:
+        return IndustryTier.NORMAL, "行业信息缺失", StockType.DEFAULT
+    tier_rank, type_rank = _keyword_ranks(industry)
+    tier = _TIER_BY_RANK[tier_rank]
+    return tier, _INDUSTRY_COMMENTS[tier].format(industry=industry), _TYPE_BY_RANK[type_rank]
+
+
 # ========================================
 # Dang氏PE估值阈值配置
 # ========================================
@@ -111,6 +240,43 @@ PE_THRESHOLDS: Dict[StockType, Dict[str, float]] = {
     },
 }
 
+# 参与分档的阈值：超过 warning 即为危险，danger 阈值不影响档位
+_PE_LEVELS = ("ideal", "acceptable", "warning")
+
+# 各类型的阈值行 (ideal, acceptable, warning)
+_PE_ROWS: Dict[StockType, Tuple[float, ...]] = {
+    stock_type: tuple(PE_THRESHOLDS[stock_type][level] for level in _PE_LEVELS)
+    for stock_type in StockType
+}
+_PE_DEFAULT_ROW = _PE_ROWS[StockType.DEFAULT]
+
+# PE 档位 → (状态, 得分, 点评模板)；最后一档为 PE 缺失或为负
+_PE_GRADES = (
+    ("理想", 25, "✅ PE={pe:.1f}，估值极具吸引力，Dang氏认可的好价格"),
+    ("可接受", 20, "✅ PE={pe:.1f}，估值合理，可以考虑建仓"),
+    ("警告", 10, "⚠️ PE={pe:.1f}，估值偏高，容易'挂旗杆'"),
+    ("危险", 0, "❌ PE={pe:.1f}，估值过高，Dang氏铁律：坚决不碰！"),
+    ("未知", 10, "PE数据缺失或为负，无法判断"),
+)
+_PE_GRADE_DANGER = 3
+_PE_GRADE_UNKNOWN = 4
+
+
+def _none_if_nan(value: Optional[float]) -> Optional[float]:
+    """NaN 视为数据缺失（与 analyze_batch 中数值列的 NaN 处理一致）"""
+    if value is not None and value != value:
+        return None
+    return value
+
+
+def _pe_grade(pe: Optional[float], stock_type: StockType) -> int:
+    """PE 档位（_PE_GRADES 下标，None/NaN 与非正值为未知）"""
+    if pe is None or not pe > 0:
+        return _PE_GRADE_UNKNOWN
+    row = _PE_ROWS.get(stock_type, _PE_DEFAULT_ROW)
+    # 第一个满足 pe <= 阈值 的档位；都不满足为危险
+    return bisect_left(row, pe)
+
 
 # ========================================
 # Dang氏股息率配置
@@ -123,6 +289,36 @@ DIVIDEND_CONFIG = {
     "poor": 0.0,         # 不分红，"耍流氓"
 }
 
+# 批量分析用的股息率分档边界（np.digitize 结果：0=差 1=可接受 2=良好 3=优秀）
+_DIVIDEND_BINS = np.array(
+    [DIVIDEND_CONFIG["acceptable"], DIVIDEND_CONFIG["good"], DIVIDEND_CONFIG["excellent"]],
+    dtype=np.float64,
+)
+
+# 股息率档位 → (状态, 得分, 点评模板)；下标与 _DIVIDEND_BINS 的分档一致，最后一档为数据缺失
+_DIVIDEND_GRADES = (
+    ("差", 0, "⚠️ 股息率{dividend_yield:.2f}%或不分红，Dang氏说这是'耍流氓'"),
+    ("可接受", 8, "⚡ 股息率{dividend_yield:.2f}%，分红一般，看其他因素"),
+    ("良好", 15, "✅ 股息率{dividend_yield:.2f}%，分红稳定，值得关注"),
+    ("优秀", 20, "✅ 股息率{dividend_yield:.2f}%，这才是Dang氏最爱的生产资料！"),
+    ("未知", 5, "股息数据缺失"),
+)
+_DIVIDEND_GRADE_POOR = 0
+_DIVIDEND_GRADE_UNKNOWN = 4
+
+
+def _dividend_grade(dividend_yield: Optional[float]) -> int:
+    """股息率档位（_DIVIDEND_GRADES 下标，None/NaN 为未知）"""
+    if dividend_yield is None or dividend_yield != dividend_yield:
+        return _DIVIDEND_GRADE_UNKNOWN
+    if dividend_yield >= DIVIDEND_CONFIG["excellent"]:
+        return 3
+    if dividend_yield >= DIVIDEND_CONFIG["good"]:
+        return 2
+    if dividend_yield >= DIVIDEND_CONFIG["acceptable"]:
+        return 1
+    return _DIVIDEND_GRADE_POOR
+
 
 # ========================================
 # Dang氏交易配置
@@ -167,12 +363,101 @@ RISK_PENALTIES = {
     "no_dividend": -3,            # 不分红
 }
 
+# analyze() 热路径直接读取的扣分值（省去每次按键查字典）
+_PEN_PROFIT_TAKE, _PEN_SELLING, _PEN_BLACKLIST, _PEN_PE_HIGH, _PEN_NO_DIV = (
+    RISK_PENALTIES[key]
+    for key in ("profit_take_warning", "shareholder_selling", "blacklist_industry", "pe_too_high", "no_dividend")
+)
+
+# 行业等级得分（基本面总分中的商业模式部分）
+_TIER_SCORE: Dict[IndustryTier, int] = {
+    IndustryTier.PREFERRED: 15,
+    IndustryTier.NORMAL: 10,
+    IndustryTier.CAUTION: 5,
+    IndustryTier.BLACKLIST: 0,
+}
+
+
+# ========================================
+# 批量评分（analyze_batch 的数值核心）
+# ========================================
+
+# 按 _TIER_BY_RANK / _TYPE_BY_RANK 优先级下标排列的查找表
+_TIER_SCORE_BY_RANK = np.array([_TIER_SCORE[tier] for tier in _TIER_BY_RANK], dtype=np.int64)
+# 按股票类型优先级下标排列的 PE 阈值行，与 _pe_grade 使用同一组 _PE_ROWS
+_PE_LIMITS_BY_RANK = np.array([_PE_ROWS[stock_type] for stock_type in _TYPE_BY_RANK], dtype=np.float64)
+_TIER_RANK_BLACKLIST = _TIER_BY_RANK.index(IndustryTier.BLACKLIST)
+
+# 按档位下标排列的得分表
+_PE_GRADE_SCORES = np.array([grade[1] for grade in _PE_GRADES], dtype=np.int64)
+_DIVIDEND_GRADE_SCORES = np.array([grade[1] for grade in _DIVIDEND_GRADES], dtype=np.int64)
+
+
+def _score_batch(
+    pe: np.ndarray,
+    dividend_yield: np.ndarray,
+    price_change_pct: np.ndarray,
+    price_from_high_pct: np.ndarray,
+    shareholder_selling: np.ndarray,
+    tier_rank: np.ndarray,
+    pe_limits: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """
+    批量计算估值/股息档位、信号、扣分与基本面总分
+    
+    输入都是等长数组：数值列以 NaN 表示缺失，行业档位以优先级下标编码，
+    pe_limits 为调用方按行展开好的 (N, 3) 连续 PE 阈值，核心内只做逐元素比较，
+    不再按行从小表中取阈值。
+    
+    Returns:
+        {pe_grade, pe_score, dividend_grade, dividend_score, profit_take_alert,
+         rebuy_opportunity, risk_penalty, fundamental_score}
+    """
+    # 估值：档位为 _PE_GRADES 下标 = 未满足 pe <= 阈值 的阈值个数（NaN 均不满足，即危险）
+    pe_grade = np.where(
+        pe > 0,
+        np.count_nonzero(~(pe[:, None] <= pe_limits), axis=1),
+        _PE_GRADE_UNKNOWN,
+    )
+    # 股息：档位为 _DIVIDEND_GRADES 下标
+    dividend_grade = np.where(
+        np.isnan(dividend_yield), _DIVIDEND_GRADE_UNKNOWN, np.digitize(dividend_yield, _DIVIDEND_BINS)
+    )
+    pe_score = _PE_GRADE_SCORES[pe_grade]
+    dividend_score = _DIVIDEND_GRADE_SCORES[dividend_grade]
+    
+    # 止盈 / 补仓信号（NaN 比较结果为 False，与传入 None 一致）
+    profit_take_alert = price_change_pct >= PROFIT_TAKE_THRESHOLD
+    rebuy_opportunity = price_from_high_pct >= REBUY_DROP_THRESHOLD
+    
+    risk_penalty = (
+        profit_take_alert * _PEN_PROFIT_TAKE
+        + shareholder_selling * _PEN_SELLING
+        + (tier_rank == _TIER_RANK_BLACKLIST) * _PEN_BLACKLIST
+        + (pe_grade == _PE_GRADE_DANGER) * _PEN_PE_HIGH
+        + (dividend_grade == _DIVIDEND_GRADE_POOR) * _PEN_NO_DIV
+    )
+    
+    # 基本面总分（限制在0-60）
+    fundamental_score = np.clip(pe_score + dividend_score + _TIER_SCORE_BY_RANK[tier_rank] + risk_penalty, 0, 60)
+    
+    return {
+        'pe_grade': pe_grade,
+        'pe_score': pe_score,
+        'dividend_grade': dividend_grade,
+        'dividend_score': dividend_score,
+        'profit_take_alert': profit_take_alert,
+        'rebuy_opportunity': rebuy_opportunity,
+        'risk_penalty': risk_penalty,
+        'fundamental_score': fundamental_score,
+    }
+
 
 # ========================================
 # Dang氏筛选器类
 # ========================================
 
-@dataclass
+@dataclass(slots=True)
 class DangAnalysisResult:
     """Dang氏分析结果"""
     # 行业分析
@@ -183,28 +468,142 @@ class DangAnalysisResult:
     stock_type: StockType = StockType.DEFAULT
     pe_status: str = "未知"      # 理想/可接受/警告/危险
     pe_score: int = 0            # 估值得分 (0-25)
-    pe_comment: str = ""
+    pe_grade: int = -1           # PE 档位（_PE_GRADES 下标），-1 表示未评估
+    pe: Optional[float] = None   # 参与评估的PE，用于按需生成点评
     
     # 股息分析
     dividend_status: str = "未知"  # 优秀/良好/可接受/差
     dividend_score: int = 0       # 股息得分 (0-20)
-    dividend_comment: str = ""
+    dividend_grade: int = -1      # 股息率档位（_DIVIDEND_GRADES 下标），-1 表示未评估
+    dividend_yield: Optional[float] = None
     
     # 交易信号
     profit_take_alert: bool = False   # 止盈警告
     rebuy_opportunity: bool = False   # 补仓机会
     
     # 风险项
-    risk_items: list = None
+    risk_items: list = field(default_factory=list)
     risk_penalty: int = 0
     
     # 总评
     fundamental_score: int = 0    # 基本面总分 (0-60)
-    dang_comment: str = ""        # Dang氏风格点评
     
-    def __post_init__(self):
-        if self.risk_items is None:
-            self.risk_items = []
+    @property
+    def pe_comment(self) -> str:
+        """PE点评（访问时才格式化，批量筛选只看得分时不产生字符串开销）"""
+        if self.pe_grade < 0:
+            return ""
+        return _PE_GRADES[self.pe_grade][2].format(pe=self.pe)
+    
+    @property
+    def dividend_comment(self) -> str:
+        """股息点评（访问时才格式化）"""
+        if self.dividend_grade < 0:
+            return ""
+        return _DIVIDEND_GRADES[self.dividend_grade][2].format(dividend_yield=self.dividend_yield)
+    
+    @property
+    def dang_comment(self) -> str:
+        """Dang氏风格点评（由其他字段按需生成，只看得分的批量筛选不产生拼接开销）"""
+        comments = []
+        
+        # 止盈优先
+        if self.profit_take_alert:
+            comments.append("兄弟，该止盈就止盈，后面涨多少那是别人的钱。")
+        
+        # 行业点评
+        if self.industry_tier == IndustryTier.PREFERRED:
+            comments.append("生产资料到手，拿着踏实。有的，兄弟，有的。")
+        elif self.industry_tier == IndustryTier.BLACKLIST:
+            comments.append("这种内卷行业，大家都觉得自己能卷死对手，最后一起死。我不碰。")
+        
+        # 估值点评
+        if self.pe_status == "危险":
+            comments.append("300PE的科技股，故事讲得再好，没有信仰，跌下来你拿不住。")
+        elif self.pe_status == "理想":
+            comments.append("这个估值，模糊的正确远胜精确的错误，干就完了。")
+        
+        # 股息点评
+        if self.dividend_status == "优秀":
+            comments.append("5%以上的股息，这才是我要的生产资料。")
+        elif self.dividend_status == "差":
+            comments.append("不分红？那不是耍流氓嘛。")
+        
+        if not comments:
+            comments.append("继续观察，鄙人不善择时。")
+        
+        return " ".join(comments)
+
+
+@dataclass
+class BatchAnalysisResult:
+    """
+    批量分析结果（列式存储）
+    
+    每个字段是与输入等长的数组，整批只占几列数值内存；按位置取某只股票
+    （result[i]）时才构造对应的 DangAnalysisResult，需要表格时调用 to_frame()。
+    """
+    index: pd.Index
+    
+    # 行业：按 pd.factorize 编码，industry_names 为不同的行业名
+    industry_codes: np.ndarray
+    industry_names: np.ndarray
+    tier_rank: np.ndarray                # _TIER_BY_RANK 下标
+    type_rank: np.ndarray                # _TYPE_BY_RANK 下标
+    
+    # 原始输入（NaN 表示缺失），用于按需生成点评
+    pe: np.ndarray
+    dividend_yield: np.ndarray
+    price_change_pct: np.ndarray
+    price_from_high_pct: np.ndarray
+    shareholder_selling: np.ndarray
+    
+    # 等级、得分与信号
+    pe_grade: np.ndarray                 # _PE_GRADES 下标
+    pe_score: np.ndarray
+    dividend_grade: np.ndarray           # _DIVIDEND_GRADES 下标
+    dividend_score: np.ndarray
+    profit_take_alert: np.ndarray
+    rebuy_opportunity: np.ndarray
+    risk_penalty: np.ndarray
+    fundamental_score: np.ndarray
+    
+    def __len__(self) -> int:
+        return len(self.index)
+    
+    def __getitem__(self, i: int) -> DangAnalysisResult:
+        """
+        按位置取单只股票的完整结果（含点评与风险项）
+        
+        经由 analyze() 的缓存路径生成，保证与逐只调用 analyze() 的结果一致。
+        """
+        def optional(values: np.ndarray) -> Optional[float]:
+            value = values[i]
+            return None if np.isnan(value) else float(value)
+        
+        return _SHARED_FILTER.analyze(
+            industry=self.industry_names[self.industry_codes[i]],
+            pe=optional(self.pe),
+            dividend_yield=optional(self.dividend_yield),
+            price_change_pct=optional(self.price_change_pct),
+            price_from_high_pct=optional(self.price_from_high_pct),
+            shareholder_selling=bool(self.shareholder_selling[i]),
+        )
+    
+    def to_frame(self) -> pd.DataFrame:
+        """转为与输入同索引的 DataFrame（等级编码还原为枚举与状态文字）"""
+        return pd.DataFrame({
+            'industry_tier': np.array(_TIER_BY_RANK, dtype=object)[self.tier_rank],
+            'stock_type': np.array(_TYPE_BY_RANK, dtype=object)[self.type_rank],
+            'pe_status': np.array([grade[0] for grade in _PE_GRADES], dtype=object)[self.pe_grade],
+            'pe_score': self.pe_score,
+            'dividend_status': np.array([grade[0] for grade in _DIVIDEND_GRADES], dtype=object)[self.dividend_grade],
+            'dividend_score': self.dividend_score,
+            'profit_take_alert': self.profit_take_alert,
+            'rebuy_opportunity': self.rebuy_opportunity,
+            'risk_penalty': self.risk_penalty,
+            'fundamental_score': self.fundamental_score,
+        }, index=self.index)
 
 
 class DangFilter:
@@ -230,22 +629,9 @@ class DangFilter:
         if not industry:
             return IndustryTier.NORMAL, "行业信息缺失"
         
-        # 检查黑名单
-        for blacklist in BLACKLIST_INDUSTRIES:
-            if blacklist in industry:
-                return IndustryTier.BLACKLIST, f"⚠️ {industry}属于Dang氏黑名单行业，内卷严重或商业模式差"
-        
-        # 检查优选行业
-        for preferred in PREFERRED_INDUSTRIES:
-            if preferred in industry:
-                return IndustryTier.PREFERRED, f"✅ {industry}是Dang氏优选的生产资料类行业"
-        
-        # 检查谨慎行业
-        for caution in CAUTION_INDUSTRIES:
-            if caution in industry:
-                return IndustryTier.CAUTION, f"⚡ {industry}需要额外关注政策和估值风险"
-        
-        return IndustryTier.NORMAL, f"{industry}属于普通行业"
+        # 黑名单 > 优选 > 谨慎，全部关键词一次扫描（行业名就是关键词时直接查表）
+        tier = _TIER_BY_RANK[_keyword_ranks(industry)[0]]
+        return tier, _INDUSTRY_COMMENTS[tier].format(industry=industry)
     
     def classify_stock_type(self, industry: str) -> StockType:
         """
@@ -260,29 +646,8 @@ class DangFilter:
         if not industry:
             return StockType.DEFAULT
         
-        # 银行
-        if "银行" in industry:
-            return StockType.BANKING
-        
-        # 周期股
-        cyclical_keywords = ["有色", "煤炭", "钢铁", "石油", "化工", "矿", "水泥", "航运"]
-        for kw in cyclical_keywords:
-            if kw in industry:
-                return StockType.CYCLICAL
-        
-        # 科技股
-        tech_keywords = ["科技", "软件", "互联网", "半导体", "芯片", "AI", "人工智能", "云计算"]
-        for kw in tech_keywords:
-            if kw in industry:
-                return StockType.TECH
-        
-        # 消费股
-        consumer_keywords = ["白酒", "食品", "饮料", "家电", "服装", "零售", "消费"]
-        for kw in consumer_keywords:
-            if kw in industry:
-                return StockType.CONSUMER
-        
-        return StockType.DEFAULT
+        # 银行 > 周期 > 科技 > 消费，与行业等级共用同一个关键词匹配器（精确命中时查表）
+        return _TYPE_BY_RANK[_keyword_ranks(industry)[1]]
     
     def evaluate_pe(self, pe: Optional[float], stock_type: StockType) -> Tuple[str, int, str]:
         """
@@ -295,19 +660,8 @@ class DangFilter:
         Returns:
             (状态, 得分, 点评)
         """
-        if pe is None or pe <= 0:
-            return "未知", 10, "PE数据缺失或为负，无法判断"
-        
-        thresholds = PE_THRESHOLDS.get(stock_type, PE_THRESHOLDS[StockType.DEFAULT])
-        
-        if pe <= thresholds["ideal"]:
-            return "理想", 25, f"✅ PE={pe:.1f}，估值极具吸引力，Dang氏认可的好价格"
-        elif pe <= thresholds["acceptable"]:
-            return "可接受", 20, f"✅ PE={pe:.1f}，估值合理，可以考虑建仓"
-        elif pe <= thresholds["warning"]:
-            return "警告", 10, f"⚠️ PE={pe:.1f}，估值偏高，容易'挂旗杆'"
-        else:
-            return "危险", 0, f"❌ PE={pe:.1f}，估值过高，Dang氏铁律：坚决不碰！"
+        status, score, template = _PE_GRADES[_pe_grade(pe, stock_type)]
+        return status, score, template.format(pe=pe)
     
     def evaluate_dividend(self, dividend_yield: Optional[float]) -> Tuple[str, int, str]:
         """
@@ -319,17 +673,8 @@ class DangFilter:
         Returns:
             (状态, 得分, 点评)
         """
-        if dividend_yield is None:
-            return "未知", 5, "股息数据缺失"
-        
-        if dividend_yield >= DIVIDEND_CONFIG["excellent"]:
-            return "优秀", 20, f"✅ 股息率{dividend_yield:.2f}%，这才是Dang氏最爱的生产资料！"
-        elif dividend_yield >= DIVIDEND_CONFIG["good"]:
-            return "良好", 15, f"✅ 股息率{dividend_yield:.2f}%，分红稳定，值得关注"
-        elif dividend_yield >= DIVIDEND_CONFIG["acceptable"]:
-            return "可接受", 8, f"⚡ 股息率{dividend_yield:.2f}%，分红一般，看其他因素"
-        else:
-            return "差", 0, f"⚠️ 股息率{dividend_yield:.2f}%或不分红，Dang氏说这是'耍流氓'"
+        status, score, template = _DIVIDEND_GRADES[_dividend_grade(dividend_yield)]
+        return status, score, template.format(dividend_yield=dividend_yield)
     
     def check_profit_take(self, price_change_pct: Optional[float]) -> Tuple[bool, str]:
         """
@@ -391,20 +736,50 @@ class DangFilter:
             price_from_high_pct: 距离高点跌幅
             shareholder_selling: 是否有大股东减持
             
+        数值参数为 NaN 时视为数据缺失（等同于 None），与 analyze_batch 的结果一致
+            
         Returns:
             DangAnalysisResult
         """
+        # 结果只取决于输入，批量筛选时相同输入直接复用缓存的字段值
+        # （NaN 先转为 None：NaN 互不相等，直接作为缓存键几乎不会命中）
+        cached = _analyze_cached(
+            industry,
+            _none_if_nan(pe),
+            _none_if_nan(dividend_yield),
+            _none_if_nan(price_change_pct),
+            _none_if_nan(price_from_high_pct),
+            shareholder_selling,
+        )
+        result = DangAnalysisResult(*cached)
+        result.risk_items = list(result.risk_items)
+        return result
+    
+    def _analyze_uncached(
+        self,
+        industry: str,
+        pe: Optional[float],
+        dividend_yield: Optional[float],
+        price_change_pct: Optional[float],
+        price_from_high_pct: Optional[float],
+        shareholder_selling: bool,
+    ) -> DangAnalysisResult:
+        """analyze() 的实际计算过程（不经过缓存）"""
         result = DangAnalysisResult()
         
         # 1. 行业分析
-        result.industry_tier, result.industry_comment = self.classify_industry(industry)
-        result.stock_type = self.classify_stock_type(industry)
+        result.industry_tier, result.industry_comment, result.stock_type = _classify_industry_and_type(industry)
         
         # 2. 估值分析
-        result.pe_status, result.pe_score, result.pe_comment = self.evaluate_pe(pe, result.stock_type)
+        # 只记录档位与原始值，点评文字在访问 pe_comment / dividend_comment 时才生成
+        result.pe_grade = _pe_grade(pe, result.stock_type)
+        result.pe = pe
+        result.pe_status, result.pe_score = _PE_GRADES[result.pe_grade][:2]
         
         # 3. 股息分析
-        result.dividend_status, result.dividend_score, result.dividend_comment = self.evaluate_dividend(dividend_yield)
+        result.dividend_grade = _dividend_grade(dividend_yield)
+        result.dividend_yield = dividend_yield
+        result.dividend_status, result.dividend_score = _DIVIDEND_GRADES[result.dividend_grade][:2]
         
         # 4. 止盈检查
         result.profit_take_alert, profit_comment = self.check_profit_take(price_change_pct)
@@ -416,69 +791,128 @@ class DangFilter:
         
         # 6. 风险项和扣分
         if result.profit_take_alert:
-            result.risk_penalty += RISK_PENALTIES["profit_take_warning"]
+            result.risk_penalty += _PEN_PROFIT_TAKE
         
         if shareholder_selling:
-            result.risk_penalty += RISK_PENALTIES["shareholder_selling"]
+            result.risk_penalty += _PEN_SELLING
             result.risk_items.append("⚠️ 大股东减持，心里要有疙瘩")
         
         if result.industry_tier == IndustryTier.BLACKLIST:
-            result.risk_penalty += RISK_PENALTIES["blacklist_industry"]
+            result.risk_penalty += _PEN_BLACKLIST
             result.risk_items.append(result.industry_comment)
         
         if result.pe_status == "危险":
-            result.risk_penalty += RISK_PENALTIES["pe_too_high"]
+            result.risk_penalty += _PEN_PE_HIGH
             result.risk_items.append(result.pe_comment)
         
         if result.dividend_status == "差":
-            result.risk_penalty += RISK_PENALTIES["no_dividend"]
+            result.risk_penalty += _PEN_NO_DIV
         
         # 7. 计算基本面总分
-        industry_score = {
-            IndustryTier.PREFERRED: 15,
-            IndustryTier.NORMAL: 10,
-            IndustryTier.CAUTION: 5,
-            IndustryTier.BLACKLIST: 0,
-        }.get(result.industry_tier, 10)
+        industry_score = _TIER_SCORE.get(result.industry_tier, 10)
         
         result.fundamental_score = result.pe_score + result.dividend_score + industry_score + result.risk_penalty
         result.fundamental_score = max(0, min(60, result.fundamental_score))  # 限制在0-60
         
-        # 8. 生成Dang氏风格点评
-        result.dang_comment = self._generate_dang_comment(result)
-        
         return result
     
-    def _generate_dang_comment(self, result: DangAnalysisResult) -> str:
-        """生成Dang氏风格点评"""
-        comments = []
-        
-        # 止盈优先
-        if result.profit_take_alert:
-            comments.append("兄弟，该止盈就止盈，后面涨多少那是别人的钱。")
-        
-        # 行业点评
-        if result.industry_tier == IndustryTier.PREFERRED:
-            comments.append("生产资料到手，拿着踏实。有的，兄弟，有的。")
-        elif result.industry_tier == IndustryTier.BLACKLIST:
-            comments.append("这种内卷行业，大家都觉得自己能卷死对手，最后一起死。我不碰。")
-        
-        # 估值点评
-        if result.pe_status == "危险":
-            comments.append(f"300PE的科技股，故事讲得再好，没有信仰，跌下来你拿不住。")
-        elif result.pe_status == "理想":
-            comments.append("这个估值，模糊的正确远胜精确的错误，干就完了。")
-        
-        # 股息点评
-        if result.dividend_status == "优秀":
-            comments.append("5%以上的股息，这才是我要的生产资料。")
-        elif result.dividend_status == "差":
-            comments.append("不分红？那不是耍流氓嘛。")
-        
-        if not comments:
-            comments.append("继续观察，鄙人不善择时。")
+    def analyze_batch(self, df: pd.DataFrame) -> BatchAnalysisResult:
+        """
+        批量综合分析（按列向量化计算，适合全市场筛选）
         
-        return " ".join(comments)
+        Args:
+            df: 每行一只股票，可包含列 industry, pe, dividend_yield, price_change_pct,
+                price_from_high_pct, shareholder_selling；缺少的列按 analyze() 的默认值处理，
+                数值列中的 NaN 视为数据缺失（等同于传入 None）
+                
+        Returns:
+            BatchAnalysisResult：列式存储的等级、得分与信号；点评文字不在批量计算中生成，
+            result[i] 按需构造单只股票的 DangAnalysisResult，result.to_frame() 转为 DataFrame
+        """
+        n = len(df)
+        
+        def numeric(col: str) -> np.ndarray:
+            if col not in df.columns:
+                return np.full(n, np.nan)
+            return pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        
+        # 1. 行业分析：每个不同的行业名只分类一次，再按编码展开为各行的优先级下标
+        industries = df['industry'].fillna("") if 'industry' in df.columns else pd.Series("", index=df.index)
+        codes, uniques = pd.factorize(industries)
+        no_keyword = (len(_TIER_BY_RANK) - 1, len(_TYPE_BY_RANK) - 1)
+        unique_ranks = np.array(
+            [_keyword_ranks(ind) if ind else no_keyword for ind in uniques], dtype=np.intp
+        ).reshape(-1, 2)
+        tier_rank = unique_ranks[codes, 0]
+        type_rank = unique_ranks[codes, 1]
+        
+        if 'shareholder_selling' in df.columns:
+            shareholder_selling = df['shareholder_selling'].fillna(False).astype(bool).to_numpy()
+        else:
+            shareholder_selling = np.zeros(n, dtype=bool)
+        
+        pe = numeric('pe')
+        dividend_yield = numeric('dividend_yield')
+        price_change_pct = numeric('price_change_pct')
+        price_from_high_pct = numeric('price_from_high_pct')
+        
+        # 2-7. 估值、股息、信号、扣分与总分
+        scores = _score_batch(
+            pe,
+            dividend_yield,
+            price_change_pct,
+            price_from_high_pct,
+            shareholder_selling,
+            tier_rank,
+            _PE_LIMITS_BY_RANK[type_rank],
+        )
+        
+        # 档位与得分范围都很小，按窄整数类型存放
+        return BatchAnalysisResult(
+            index=df.index,
+            industry_codes=codes,
+            industry_names=np.asarray(uniques, dtype=object),
+            tier_rank=tier_rank.astype(np.int8),
+            type_rank=type_rank.astype(np.int8),
+            pe=pe,
+            dividend_yield=dividend_yield,
+            price_change_pct=price_change_pct,
+            price_from_high_pct=price_from_high_pct,
+            shareholder_selling=shareholder_selling,
+            pe_grade=scores['pe_grade'].astype(np.int8),
+            pe_score=scores['pe_score'].astype(np.int16),
+            dividend_grade=scores['dividend_grade'].astype(np.int8),
+            dividend_score=scores['dividend_score'].astype(np.int16),
+            profit_take_alert=scores['profit_take_alert'],
+            rebuy_opportunity=scores['rebuy_opportunity'],
+            risk_penalty=scores['risk_penalty'].astype(np.int16),
+            fundamental_score=scores['fundamental_score'].astype(np.int16),
+        )
+
+
+@functools.lru_cache(maxsize=4096)
+def _analyze_cached(
+    industry: str,
+    pe: Optional[float],
+    dividend_yield: Optional[float],
+    price_change_pct: Optional[float],
+    price_from_high_pct: Optional[float],
+    shareholder_selling: bool,
+) -> tuple:
+    """
+    按输入缓存 analyze() 的计算结果（DangFilter 无状态，可在模块级共享）
+    
+    缓存键直接使用原始输入值，不对 PE/股息率取整分桶：数值落在阈值附近时取整会改变档位。
+    返回按 DangAnalysisResult 字段顺序排列的值元组（risk_items 转为 tuple 防止被修改）。
+    """
+    result = _SHARED_FILTER._analyze_uncached(
+        industry, pe, dividend_yield, price_change_pct, price_from_high_pct, shareholder_selling
+    )
+    result.risk_items = tuple(result.risk_items)
+    return tuple(getattr(result, f.name) for f in fields(DangAnalysisResult))
+
+
+_SHARED_FILTER = DangFilter()
 
 
 # ========================================
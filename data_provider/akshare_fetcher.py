@@ -25,6 +25,7 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional, Dict, Any
 
+import numpy as np
 import pandas as pd
 from tenacity import (
     retry,
@@ -35,6 +36,7 @@ from tenacity import (
 )
 
 from .base import BaseFetcher, DataFetchError, RateLimitError, STANDARD_COLUMNS
+from .base import keyed_cache_get, keyed_cache_set
 
 
 @dataclass
@@ -202,6 +204,18 @@ _hk_realtime_cache: Dict[str, Any] = {
     'ttl': 60  # 60秒缓存有效期
 }
 
+# 历史估值分位缓存（按股票代码，日级数据）
+_valuation_cache: Dict[str, Any] = {
+    'data': {},  # stock_code -> (timestamp, result)
+    'ttl': 3600  # 1小时缓存有效期
+}
+
+# 行业成分股缓存（按行业，同行业的多只股票共享一次请求）
+_industry_cons_cache: Dict[str, Any] = {
+    'data': {},  # industry -> (timestamp, DataFrame)
+    'ttl': 3600  # 1小时缓存有效期
+}
+
 
 def _is_etf_code(stock_code: str) -> bool:
     """
@@ -996,6 +1010,11 @@ class AkshareFetcher(BaseFetcher):
         import akshare as ak
         if _is_etf_code(stock_code) or _is_hk_code(stock_code):
             return None
+        
+        cached = keyed_cache_get(_valuation_cache, stock_code)
+        if cached is not None:
+            logger.debug(f"[缓存命中] 使用缓存的 {stock_code} 历史估值数据")
+            return dict(cached)
             
         try:
             self._enforce_rate_limit()
@@ -1018,8 +1037,10 @@ class AkshareFetcher(BaseFetcher):
                  return None
                  
             # 筛选近10年
-            current = df[val_col].iloc[-1]
-            rank = (df[val_col] < current).mean() * 100
+            # 单次分位查询：一次 O(N) 比较计数即可（排序 + 二分查找需要 O(N log N)）
+            values = df[val_col].to_numpy(dtype=float)
+            current = values[-1]
+            rank = np.count_nonzero(values < current) / values.size * 100
             
             result = {
                 'current_pe': float(current),
@@ -1027,7 +1048,8 @@ class AkshareFetcher(BaseFetcher):
                 # 百度接口暂只取了PE，PB若需要可多次调用，这里先只返回PE
             }
             logger.info(f"[历史估值] {stock_code}: PE={current:.2f}, 10年分位={rank:.1f}%")
-            return result
+            keyed_cache_set(_valuation_cache, stock_code, result)
+            return dict(result)
         except Exception as e:
             logger.warning(f"[API错误] 获取历史估值失败: {e}")
             return None
@@ -1049,33 +1071,34 @@ class AkshareFetcher(BaseFetcher):
                 return None
             industry = industry_row.iloc[0]['value']
             
-            # 2. 获取同业
-            self._enforce_rate_limit()
-            peers_df = ak.stock_board_industry_cons_em(symbol=industry)
+            # 2. 获取同业（同一行业的成分股在缓存有效期内只请求一次）
+            peers_df = keyed_cache_get(_industry_cons_cache, industry)
+            if peers_df is None:
+                self._enforce_rate_limit()
+                peers_df = ak.stock_board_industry_cons_em(symbol=industry)
+                keyed_cache_set(_industry_cons_cache, industry, peers_df)
+            else:
+                logger.debug(f"[缓存命中] 使用缓存的 {industry} 行业成分股")
             if peers_df.empty:
                 return None
                 
             # 3. 寻找总市值列 (Fuzzy Match, 解决乱码/变动)
-            mv_col = None
-            pe_col = None
-            
-            for col in peers_df.columns:
-                if '市值' in col and '总' in col:
-                    mv_col = col
-                if '市盈率' in col and '动' in col:
-                    pe_col = col
-            
-            # Fallback
-            if not mv_col:
-                for col in peers_df.columns:
-                    if '市值' in col: mv_col = col; break
-            
-            if not mv_col:
+            # 列名上一次性做子串匹配：总市值/动态市盈率取最后一个命中列，缺少总市值时回退到第一个市值列
+            cols = peers_df.columns
+            mv_cols = cols[cols.str.contains('市值', regex=False, na=False)]
+            total_mv_cols = mv_cols[mv_cols.str.contains('总', regex=False, na=False)]
+            pe_cols = cols[cols.str.contains('市盈率', regex=False, na=False)
+                           & cols.str.contains('动', regex=False, na=False)]
+            mv_col = total_mv_cols[-1] if len(total_mv_cols) else (mv_cols[0] if len(mv_cols) else None)
+            pe_col = pe_cols[-1] if len(pe_cols) else None
+            
+            if mv_col is None:
                 return None # 无法排序
                 
-            # 排序取龙头
-            peers_df.sort_values(by=mv_col, ascending=False, inplace=True)
-            top_peers = peers_df.head(5)
+            # 取市值前 5 的龙头（转为数值后用堆选取，无需整表排序；无法解析的市值视为缺失）
+            # assign 生成新表，不修改缓存中的成分股数据
+            peers_df = peers_df.assign(**{mv_col: pd.to_numeric(peers_df[mv_col], errors='coerce')})
+            top_peers = peers_df.nlargest(5, mv_col)
             
             # 计算同业平均PE
             avg_pe = 0.0
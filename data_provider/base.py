@@ -19,7 +19,7 @@ import random
 import time
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict, Any
 
 import pandas as pd
 import numpy as np
@@ -53,6 +53,22 @@ class DataSourceUnavailableError(DataFetchError):
     pass
 
 
+# === 按键缓存 ===
+# 缓存结构：{'data': {key: (写入时间戳, 值)}, 'ttl': 有效期秒数}
+
+def keyed_cache_get(cache: Dict[str, Any], key: str) -> Any:
+    """读取按键缓存，不存在或已过期时返回 None"""
+    entry = cache['data'].get(key)
+    if entry is not None and time.time() - entry[0] < cache['ttl']:
+        return entry[1]
+    return None
+
+
+def keyed_cache_set(cache: Dict[str, Any], key: str, value: Any) -> None:
+    """写入按键缓存"""
+    cache['data'][key] = (time.time(), value)
+
+
 class BaseFetcher(ABC):
     """
     数据源抽象基类
@@ -11,14 +11,88 @@ Author: Godxiemu (User) / Antigravity (Agent)
 """
 
 import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from typing import Optional, Dict, Tuple
-from data_provider.akshare_fetcher import AkshareFetcher # Reuse random sleep logic if needed, or just import akshare
-import akshare as ak
+from typing import Optional, Dict, Tuple, Any, Iterable
+from config import get_config
+from data_provider.base import keyed_cache_get, keyed_cache_set
 
 logger = logging.getLogger(__name__)
 
+# 分红历史与行业类型按股票代码缓存一个交易日（盘中不会变化，重复分析时避免再次请求接口）
+_dividend_history_cache: Dict[str, Any] = {
+    'data': {},
+    'ttl': 86400,
+}
+
+_stock_type_cache: Dict[str, Any] = {
+    'data': {},
+    'ttl': 86400,
+}
+
+# 接口请求节流（所有线程共享）：相邻两次请求的发起时间间隔为随机的 1-2 秒，
+# 与 AkshareFetcher 一样用不规则间隔防止触发反爬封禁；只预约发起时间，等待时不持锁
+_REQUEST_INTERVAL = (1.0, 2.0)
+_request_throttle: Dict[str, Any] = {
+    'lock': threading.Lock(),
+    'next_at': 0.0,
+}
+
+
+def _throttle_request() -> None:
+    """等待到本线程预约的请求时间"""
+    with _request_throttle['lock']:
+        now = time.time()
+        start_at = max(now, _request_throttle['next_at'])
+        _request_throttle['next_at'] = start_at + random.uniform(*_REQUEST_INTERVAL)
+    if start_at > now:
+        time.sleep(start_at - now)
+
+
+# 行业关键词 → 股票类型，按 bank > cyclical > tech > utility 的优先级排列，取第一个命中的关键词
+_DIV_KW_TO_BUCKET: Dict[str, str] = {
+    '银行': 'bank',
+    **dict.fromkeys(['煤炭', '有色', '钢铁', '石油', '化工', '海运'], 'cyclical'),
+    **dict.fromkeys(['科技', '软件', '半导体', '电子'], 'tech'),
+    **dict.fromkeys(['电力', '水务', '燃气', '高速'], 'utility'),
+}
+
+# '报告期' 中的年报（如 '2023年报'），捕获年份用于排序
+_ANNUAL_REPORT_RE = re.compile(r'(\d{4})年报')
+
+
+def _annual_report_years(periods: pd.Series) -> np.ndarray:
+    """
+    '报告期' 列中年报的年份（非年报为 NaN）
+    
+    分类列（get_dividend_history 返回的数据）只对类别解析一次，再按整数编码展开到各行
+    """
+    if isinstance(periods.dtype, pd.CategoricalDtype):
+        category_years = _annual_report_years(periods.cat.categories.to_series())
+        # 编码 -1 表示缺失值，对应追加在末尾的 NaN
+        return np.append(category_years, np.nan)[periods.cat.codes.to_numpy()]
+    return pd.to_numeric(
+        periods.str.extract(_ANNUAL_REPORT_RE, expand=False), errors='coerce'
+    ).to_numpy(dtype=np.float64)
+
+
+def _mean_valid_payout(payouts: np.ndarray) -> float:
+    """
+    有效股利支付率的均值（数值核心，输入为已解析的 float 数组，无法解析的为 NaN）
+    
+    过滤 NaN 与异常值（<=0 或 >=200%，大于200%可能是一次性分配），无有效值时返回 0.0
+    """
+    valid = payouts[(payouts > 0) & (payouts < 2.0)]
+    if valid.size == 0:
+        return 0.0
+    return float(valid.sum() / valid.size)
+
+
 class DividendAnalyzer:
     """
     股息率分析器
@@ -27,11 +101,40 @@ class DividendAnalyzer:
     def __init__(self):
         pass
 
+    def prefetch(self, codes: Iterable[str], max_workers: Optional[int] = None) -> None:
+        """
+        并发预取多只股票的分红历史与行业类型，填充缓存
+        
+        接口调用是网络 I/O，线程并发即可；请求经过共享节流，并发数默认取配置的
+        max_workers（低并发防封禁）。之后的 calculate_expected_yield 等调用直接命中缓存。
+        """
+        if max_workers is None:
+            max_workers = get_config().max_workers
+        
+        def fetch(code: str) -> None:
+            self.get_dividend_history(code)
+            self.get_stock_type(code)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(fetch, codes))
+
     def get_dividend_history(self, code: str) -> pd.DataFrame:
         """获取分红历史数据"""
+        cached = keyed_cache_get(_dividend_history_cache, code)
+        if cached is not None:
+            logger.debug(f"[缓存命中] 使用缓存的 {code} 分红历史")
+            return cached
+        
+        import akshare as ak  # 延迟导入：只在真正请求接口时才加载 akshare
+        
         try:
             # ak.stock_fhps_detail_ths 返回: 报告期, 分红方案说明, 股利支付率, etc.
+            _throttle_request()
             df = ak.stock_fhps_detail_ths(symbol=code)
+            if '报告期' in df.columns:
+                # 报告期只有少量不同取值，转为分类后年报筛选只需解析各类别一次
+                df['报告期'] = df['报告期'].astype('category')
+            keyed_cache_set(_dividend_history_cache, code, df)
             return df
         except Exception as e:
             logger.warning(f"获取分红历史失败 {code}: {e}")
@@ -54,55 +157,55 @@ class DividendAnalyzer:
         # 筛选"年报"数据 (中期分红通常只是补充，但也可能包含。通常PayoutRatio是基于全年的)
         # akshare数据的'报告期'如 '2023年报', '2023中报'
         # '股利支付率' 列通常只有年报有完整统计，或者是单次的。
-        # 让我们过滤出 '年报'
-        annual_df = df[df['报告期'].str.contains('年报', na=False)].copy()
-        
-        # 排序：报告期降序 (最近的在前)
-        annual_df.sort_values(by='报告期', ascending=False, inplace=True)
-        
-        # 取最近N年
-        recent = annual_df.head(years)
-        
-        payouts = []
-        for val in recent['股利支付率']:
-            if pd.isna(val) or val == '--':
-                continue
-            # 格式可能为 '30.5%'
-            try:
-                payout = float(val.strip('%')) / 100.0
-                if 0 < payout < 2.0: # 过滤异常值 (大于200%可能是一次性分配)
-                    payouts.append(payout)
-            except:
-                continue
-                
-        if not payouts:
-            return 0.0
-            
-        return sum(payouts) / len(payouts)
+        # 让我们过滤出 '年报'，并提取年份（没有年份的无法排序，不参与计算）
+        report_year = _annual_report_years(df['报告期'])
+        annual_pos = np.flatnonzero(~np.isnan(report_year))
+        
+        # 按年份降序 (最近的在前) 取最近N年，直接按位置取行，无需复制和字符串排序
+        order = np.argsort(-report_year[annual_pos], kind='stable')[:years]
+        recent = df.iloc[annual_pos[order]]
+        
+        # 整列一次解析后交给数值核心求均值：格式可能为 '30.5%'，
+        # 非字符串单元格与 '--' 等无法解析的值记为 NaN（由数值核心过滤）
+        values = recent['股利支付率']
+        # 全为 NaN 或纯数值的列不是字符串 dtype，筛选后再统一转为 str 才能使用 .str
+        text = values[values.map(lambda v: isinstance(v, str)).astype(bool)].astype(str)
+        payouts = pd.to_numeric(text.str.strip('%'), errors='coerce').to_numpy(dtype=np.float64) / 100.0
+        
+        return _mean_valid_payout(payouts)
 
     def get_stock_type(self, code: str) -> str:
         """获取股票类型 (bank/cyclical/tech/utility/other)"""
+        cached = keyed_cache_get(_stock_type_cache, code)
+        if cached is not None:
+            return cached
+        stock_type = self._fetch_stock_type(code)
+        if stock_type is not None:
+            keyed_cache_set(_stock_type_cache, code, stock_type)
+        return stock_type or 'default'
+
+    def _fetch_stock_type(self, code: str) -> Optional[str]:
+        """请求行业信息并判断股票类型，接口失败时返回 None（不写入缓存）"""
+        import akshare as ak
+        
         try:
             # 获取个股信息
             # ak.stock_individual_info_em(symbol="600036") -> 
             # item | value
             # 行业 | 银行
+            _throttle_request()
             df = ak.stock_individual_info_em(symbol=code)
             industry_row = df[df['item'] == '行业']
             if not industry_row.empty:
                 industry = industry_row.iloc[0]['value']
                 
-                if '银行' in industry:
-                    return 'bank'
-                elif any(x in industry for x in ['煤炭', '有色', '钢铁', '石油', '化工', '海运']):
-                    return 'cyclical'
-                elif any(x in industry for x in ['科技', '软件', '半导体', '电子']):
-                    return 'tech'
-                elif any(x in industry for x in ['电力', '水务', '燃气', '高速']):
-                    return 'utility'
-            return 'default'
-        except:
+                for kw, bucket in _DIV_KW_TO_BUCKET.items():
+                    if kw in industry:
+                        return bucket
             return 'default'
+        except Exception as e:
+            logger.warning(f"获取行业信息失败 {code}: {e}")
+            return None
 
     def calculate_expected_yield(
         self, 
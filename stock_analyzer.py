@@ -58,7 +58,7 @@ class BuySignal(Enum):
     STRONG_SELL = "强烈卖出"      # 趋势破坏
 
 
-@dataclass
+@dataclass(slots=True)
 class TrendAnalysisResult:
     """趋势分析结果"""
     code: str
@@ -165,50 +165,61 @@ class StockTrendAnalyzer:
             result.risk_factors.append("数据不足，无法完成分析")
             return result
         
-        # 确保数据按日期排序
-        df = df.sort_values('date').reset_index(drop=True)
+        # 确保数据按日期排序（已严格递增时跳过排序）
+        dates = df['date']
+        if not (dates.is_monotonic_increasing and dates.is_unique):
+            df = df.sort_values('date').reset_index(drop=True)
         
-        # 计算均线
-        df = self._calculate_mas(df)
+        # 计算均线（后续分析只读取 numpy 数组，避免逐行构造 Series）
+        arrays = self._calculate_mas(df)
         
         # 获取最新数据
-        latest = df.iloc[-1]
-        result.current_price = float(latest['close'])
-        result.ma5 = float(latest['MA5'])
-        result.ma10 = float(latest['MA10'])
-        result.ma20 = float(latest['MA20'])
-        result.ma60 = float(latest.get('MA60', 0))
+        result.current_price = float(arrays['close'][-1])
+        result.ma5 = float(arrays['MA5'][-1])
+        result.ma10 = float(arrays['MA10'][-1])
+        result.ma20 = float(arrays['MA20'][-1])
+        result.ma60 = float(arrays['MA60'][-1])
         
         # 1. 趋势判断
-        self._analyze_trend(df, result)
+        self._analyze_trend(arrays, result)
         
         # 2. 乖离率计算
         self._calculate_bias(result)
         
         # 3. 量能分析
-        self._analyze_volume(df, result)
+        self._analyze_volume(arrays, result)
         
         # 4. 支撑压力分析
-        self._analyze_support_resistance(df, result)
+        self._analyze_support_resistance(arrays, result)
         
         # 5. 生成买入信号
         self._generate_signal(result)
         
         return result
     
-    def _calculate_mas(self, df: pd.DataFrame) -> pd.DataFrame:
-        """计算均线"""
-        df = df.copy()
-        df['MA5'] = df['close'].rolling(window=5).mean()
-        df['MA10'] = df['close'].rolling(window=10).mean()
-        df['MA20'] = df['close'].rolling(window=20).mean()
+    def _calculate_mas(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        计算均线
+        
+        Returns:
+            close/high/volume 及 MA5/MA10/MA20/MA60 的 numpy 数组（不修改原 DataFrame）
+        """
+        close = df['close']
+        arrays = {
+            'close': close.to_numpy(),
+            'high': df['high'].to_numpy(dtype=float),
+            'volume': df['volume'].to_numpy(dtype=float),
+            'MA5': close.rolling(window=5).mean().to_numpy(),
+            'MA10': close.rolling(window=10).mean().to_numpy(),
+            'MA20': close.rolling(window=20).mean().to_numpy(),
+        }
         if len(df) >= 60:
-            df['MA60'] = df['close'].rolling(window=60).mean()
+            arrays['MA60'] = close.rolling(window=60).mean().to_numpy()
         else:
-            df['MA60'] = df['MA20']  # 数据不足时使用 MA20 替代
-        return df
+            arrays['MA60'] = arrays['MA20']  # 数据不足时使用 MA20 替代
+        return arrays
     
-    def _analyze_trend(self, df: pd.DataFrame, result: TrendAnalysisResult) -> None:
+    def _analyze_trend(self, arrays: Dict[str, np.ndarray], result: TrendAnalysisResult) -> None:
         """
         分析趋势状态
         
@@ -217,10 +228,14 @@ class StockTrendAnalyzer:
         ma5, ma10, ma20 = result.ma5, result.ma10, result.ma20
         
         # 判断均线排列
+        # 5 个交易日前的均线（数据不足 5 天时取最新一天）
+        prev_idx = -5 if len(arrays['close']) >= 5 else -1
+        prev_ma5 = arrays['MA5'][prev_idx]
+        prev_ma20 = arrays['MA20'][prev_idx]
+        
         if ma5 > ma10 > ma20:
             # 检查间距是否在扩大（强势）
-            prev = df.iloc[-5] if len(df) >= 5 else df.iloc[-1]
-            prev_spread = (prev['MA5'] - prev['MA20']) / prev['MA20'] * 100 if prev['MA20'] > 0 else 0
+            prev_spread = (prev_ma5 - prev_ma20) / prev_ma20 * 100 if prev_ma20 > 0 else 0
             curr_spread = (ma5 - ma20) / ma20 * 100 if ma20 > 0 else 0
             
             if curr_spread > prev_spread and curr_spread > 5:
@@ -238,8 +253,7 @@ class StockTrendAnalyzer:
             result.trend_strength = 55
             
         elif ma5 < ma10 < ma20:
-            prev = df.iloc[-5] if len(df) >= 5 else df.iloc[-1]
-            prev_spread = (prev['MA20'] - prev['MA5']) / prev['MA5'] * 100 if prev['MA5'] > 0 else 0
+            prev_spread = (prev_ma20 - prev_ma5) / prev_ma5 * 100 if prev_ma5 > 0 else 0
             curr_spread = (ma20 - ma5) / ma5 * 100 if ma5 > 0 else 0
             
             if curr_spread > prev_spread and curr_spread > 5:
@@ -278,24 +292,28 @@ class StockTrendAnalyzer:
         if result.ma20 > 0:
             result.bias_ma20 = (price - result.ma20) / result.ma20 * 100
     
-    def _analyze_volume(self, df: pd.DataFrame, result: TrendAnalysisResult) -> None:
+    def _analyze_volume(self, arrays: Dict[str, np.ndarray], result: TrendAnalysisResult) -> None:
         """
         分析量能
         
         偏好：缩量回调 > 放量上涨 > 缩量上涨 > 放量下跌
         """
-        if len(df) < 5:
+        close = arrays['close']
+        volume = arrays['volume']
+        if len(close) < 5:
             return
         
-        latest = df.iloc[-1]
-        vol_5d_avg = df['volume'].iloc[-6:-1].mean()
+        # 前 5 日均量（跳过缺失值，与 pandas mean 一致）
+        window = volume[-6:-1]
+        window = window[~np.isnan(window)]
+        vol_5d_avg = window.mean() if window.size else np.nan
         
         if vol_5d_avg > 0:
-            result.volume_ratio_5d = float(latest['volume']) / vol_5d_avg
+            result.volume_ratio_5d = float(volume[-1]) / vol_5d_avg
         
         # 判断价格变化
-        prev_close = df.iloc[-2]['close']
-        price_change = (latest['close'] - prev_close) / prev_close * 100
+        prev_close = close[-2]
+        price_change = (close[-1] - prev_close) / prev_close * 100
         
         # 量能状态判断
         if result.volume_ratio_5d >= self.VOLUME_HEAVY_RATIO:
@@ -316,7 +334,7 @@ class StockTrendAnalyzer:
             result.volume_status = VolumeStatus.NORMAL
             result.volume_trend = "量能正常"
     
-    def _analyze_support_resistance(self, df: pd.DataFrame, result: TrendAnalysisResult) -> None:
+    def _analyze_support_resistance(self, arrays: Dict[str, np.ndarray], result: TrendAnalysisResult) -> None:
         """
         分析支撑压力位
         
@@ -344,8 +362,11 @@ class StockTrendAnalyzer:
             result.support_levels.append(result.ma20)
         
         # 近期高点作为压力
-        if len(df) >= 20:
-            recent_high = df['high'].iloc[-20:].max()
+        high = arrays['high']
+        if len(high) >= 20:
+            recent = high[-20:]
+            recent = recent[~np.isnan(recent)]
+            recent_high = recent.max() if recent.size else np.nan
             if recent_high > price:
                 result.resistance_levels.append(recent_high)
     